@@ -1,124 +1,180 @@
 import dash
 from dash import dcc, html, Input, Output, State, callback_context
+from flask import Response
 import dash_bootstrap_components as dbc
 import pandas as pd
-import requests
-from io import StringIO
+import functools
 import json
+import threading
 import time
 import csv
+from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime
 
+import metrics
+import transport
+from settings import (
+    USER_DATA_CSV_URL, TOURNAMENT_ROUNDS_CSV_URL, RESULTS_FORM_URL,
+    USER_DATA_POLL_INTERVAL, TOURNAMENT_ROUNDS_POLL_INTERVAL,
+    SUBMISSION_QUEUE_PATH, SUBMISSION_CONCURRENCY, SUBMISSION_MIN_INTERVAL, REFRESH_INTERVAL_MS,
+    ROUND_EVENTS_MAX_STREAMS, PUSH_FALLBACK_REFRESH_MS, ROUND_MARKERS_REQUIRED,
+)
+from sheets import SheetPoller, SheetResponse
+from submissions import SubmissionQueue, SENT, FAILED
+
 # Initialize Dash app with Bootstrap theme for mobile responsiveness
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
 app.title = "Spikeball Tournament"
 app.config.suppress_callback_exceptions = True
 
-# Google Sheets configuration - Using public CSV export URLs
-USER_SHEET_ID = '1KmJBO5oKwygn-2AzwX-hS1wGeQMmLwyizFqtsSZo7_w'
-USER_DATA_GID = '900351397'
-
-TOURNAMENT_SHEET_ID = '1srq_lb7-c601uE3gSumhWltxsjXi3HRUVRHpdkgLu-w'
-TOURNAMENT_GID = '1153687443'
-
-RESULTS_SHEET_ID = '1vuQ394gU_CSNEO-U0ZFVRTNC1jIWV1BT_yjGqoQQPOk'
-RESULTS_GID = '0'
+def download_public_sheet(csv_url, etag=None, last_modified=None):
+    """Download the raw CSV export of a public Google Sheet.
 
-# CSV export URLs for public sheets
-USER_DATA_CSV_URL = f"https://docs.google.com/spreadsheets/d/{USER_SHEET_ID}/export?format=csv&gid={USER_DATA_GID}"
-TOURNAMENT_ROUNDS_CSV_URL = f"https://docs.google.com/spreadsheets/d/{TOURNAMENT_SHEET_ID}/export?format=csv&gid={TOURNAMENT_GID}"
-RESULTS_CSV_URL = f"https://docs.google.com/spreadsheets/d/{RESULTS_SHEET_ID}/export?format=csv&gid={RESULTS_GID}"
-
-import requests
-from io import StringIO
-
-def read_public_sheet_as_df(csv_url):
-    """Read a public Google Sheet as a pandas DataFrame"""
+    Sends the validators from the previous download so an unchanged sheet can
+    come back as a cheap 304.
+    """
     try:
-        response = requests.get(csv_url, timeout=10)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = transport.get(csv_url, headers=headers)
+        if response.status_code == 304:
+            return SheetResponse(etag=etag, last_modified=last_modified, not_modified=True)
         response.raise_for_status()
-        csv_data = StringIO(response.text)
-        df = pd.read_csv(csv_data)
-        return df
+        return SheetResponse(response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
     except Exception as e:
         print(f"Error reading sheet: {e}")
         return None
 
+def clean_columns(df):
+    """Strip stray spaces from column names of a freshly downloaded sheet"""
+    df.columns = df.columns.str.strip()
+    return df
+
+def normalize_email(email):
+    return str(email).strip().lower()
+
+@dataclass(frozen=True)
+class RegistrationIndex:
+    """Lookup tables built once per registration sheet snapshot"""
+    by_email: dict  # normalized email -> user record (as returned by check_user_exists)
+    names: dict  # sheet row number -> display name
+
+def build_registration_index(df):
+    """Index the registration sheet by email and by row number"""
+    df = clean_columns(df)
+    # Column mapping: Timestamp, UCLA email, First and Last name
+    emails = df.get('UCLA email', pd.Series('', index=df.index)).fillna('').astype(str).str.strip().str.lower()
+    full_names = df.get('First and Last name', pd.Series('', index=df.index)).fillna('').astype(str).str.strip()
+
+    by_email = {}
+    names = {}
+    # +2 because pandas is 0-indexed and we account for header row
+    for row, user_email, full_name in zip(range(2, len(df) + 2), emails, full_names):
+        # Create a simple ID from the name (remove spaces, convert to lowercase)
+        user_id = full_name.lower().replace(' ', '_').replace('.', '') if full_name else f'user_{row}'
+        names[row] = full_name if full_name else user_id
+        if user_email and user_email not in by_email:  # first registration wins
+            by_email[user_email] = {
+                'name': full_name,
+                'row': row,
+                'id': user_id,
+                'email': user_email
+            }
+    return RegistrationIndex(by_email, names)
+
+@dataclass(frozen=True)
+class RoundIndex:
+    """Per-player pool assignments built once per pools sheet snapshot"""
+    by_player: dict  # player row id -> tuple of round dicts, sorted by round
+    latest: dict  # player row id -> their most recent round dict
+
+ROUND_COLUMNS = ['Round', 'Net Number', 'id1', 'id2', 'id3', 'id4']
+
+def build_round_index(df):
+    """Parse the pools sheet once and index every assignment by player"""
+    df = clean_columns(df)
+    parsed = pd.DataFrame({
+        col: pd.to_numeric(df[col].astype(str).str.strip(), errors='coerce') if col in df else pd.Series(dtype=float)
+        for col in ROUND_COLUMNS
+    })
+    valid = parsed.notna().all(axis=1)
+    if not valid.all():
+        print(f"Skipping {int((~valid).sum())} malformed round rows")
+    records = parsed[valid].astype(int).to_dict('records')
+
+    # Net 0 rows are "round published" markers that the manager posts after
+    # every pool of a round is in (id1 = number of nets). A round is hidden
+    # until it is marked and complete, so players never see a half-posted
+    # round. Only with ROUND_MARKERS_REQUIRED off (a sheet from before markers)
+    # do unmarked rounds older than the newest marked round stay visible, and
+    # nothing is hidden until the first marker shows up.
+    markers = {r['Round']: r['id1'] for r in records if r['Net Number'] == 0}
+    records = [r for r in records if r['Net Number'] != 0]
+    nets = Counter(r['Round'] for r in records)
+    published = {rnd for rnd, num_nets in markers.items() if nets[rnd] >= num_nets}
+    if ROUND_MARKERS_REQUIRED:
+        records = [r for r in records if r['Round'] in published]
+    elif markers:
+        newest = max(published) if published else min(markers)
+        records = [r for r in records if r['Round'] in published or r['Round'] < newest]
+
+    by_player = {}
+    latest = {}
+    for round_data in records:
+        for pid in (round_data['id1'], round_data['id2'], round_data['id3'], round_data['id4']):
+            by_player.setdefault(pid, []).append(round_data)
+            # Strictly greater, so the first posting of a round wins like max() did
+            if pid not in latest or round_data['Round'] > latest[pid]['Round']:
+                latest[pid] = round_data
+    by_player = {pid: tuple(sorted(rounds, key=lambda r: r['Round'])) for pid, rounds in by_player.items()}
+    return RoundIndex(by_player, latest)
+
+# Keeps parsed copies of the registration and pools sheets fresh off the
+# request path; callbacks only ever read the latest published snapshot.
+sheet_poller = SheetPoller(download_public_sheet, {
+    USER_DATA_CSV_URL: (USER_DATA_POLL_INTERVAL, build_registration_index),
+    TOURNAMENT_ROUNDS_CSV_URL: (TOURNAMENT_ROUNDS_POLL_INTERVAL, build_round_index),
+})
+
 def check_user_exists(email):
     """Check if user exists in Google Sheets and return user data"""
     try:
-        # Read the user data sheet
-        df = read_public_sheet_as_df(USER_DATA_CSV_URL)
+        # Read the indexed user data sheet
+        snapshot = sheet_poller.get(USER_DATA_CSV_URL)
         
-        if df is None:
+        if snapshot is None:
             print("ERROR: cant read user data or nonexistent")
             return None
         
-        # Clean up column names (remove extra spaces)
-        df.columns = df.columns.str.strip()
-        
-        # Search for user by email
-        # Column mapping: Timestamp, UCLA email, First and Last name
-        for idx, row in df.iterrows():
-            user_email = str(row.get('UCLA email', '')).strip().lower()
-            if user_email == email.lower():
-                full_name = str(row.get('First and Last name', '')).strip()
-                # Create a simple ID from the name (remove spaces, convert to lowercase)
-                user_id = full_name.lower().replace(' ', '_').replace('.', '') if full_name else f'user_{idx+2}'
-                print(full_name)
-                print(idx + 2)
-                print(user_id)
-                print(email)
-                return {
-                    'name': full_name,
-                    'row': idx + 2,  # +2 because pandas is 0-indexed and we account for header row
-                    'id': user_id,
-                    'email': user_email
-                }
-        
-        return None
+        user = snapshot.data.by_email.get(normalize_email(email))
+        if user is None:
+            metrics.inc('login_lookups_total', outcome='unknown')
+            return None
+        metrics.inc('login_lookups_total', outcome='found')
+        print(user['name'], user['row'], user['id'], email)
+        return dict(user)
         
     except Exception as e:
+        metrics.inc('login_lookups_total', outcome='error')
         print(f"Error checking user: {e}")
         return None
     
 def get_user_name(user_id_list):
     try:
-        # Read the user data sheet
-        df = read_public_sheet_as_df(USER_DATA_CSV_URL)
+        # Read the indexed user data sheet
+        snapshot = sheet_poller.get(USER_DATA_CSV_URL)
         
-        if df is None:
+        if snapshot is None:
             print("ERROR: cant read user data or nonexistent")
             return user_id_list  # Return the original IDs if we can't read the sheet
-        df.columns = df.columns.str.strip()
-        records = df.to_dict('records')
-        id_to_name_mapping = {}
-        for idx, record in enumerate(records):
-            try:
-                full_name_value = record.get('First and Last name', '')
-                if pd.isna(full_name_value) or full_name_value is None:
-                    full_name = ''
-                else:
-                    full_name = str(full_name_value).strip()
-                if full_name:
-                    row_user_id = full_name.lower().replace(' ', '_').replace('.', '')
-                else:
-                    row_user_id = f'user_{idx+2}'
-                id_to_name_mapping[idx + 2] = full_name if full_name else row_user_id
-                    
-            except Exception as row_error:
-                print(f"Error processing row {idx}: {row_error}")
-                continue
-
-        result_names = []
-        for user_id in user_id_list:
-            if user_id in id_to_name_mapping:
-                result_names.append(id_to_name_mapping[user_id])
-            else:
-                result_names.append(user_id)
         
-        return result_names
+        names = snapshot.data.names
+        return [names.get(user_id, user_id) for user_id in user_id_list]
         
     except Exception as e:
         print(f"Error getting real names: {e}")
@@ -127,53 +183,41 @@ def get_user_name(user_id_list):
 def get_tournament_rounds(user_id):
     """Get tournament rounds for a specific user"""
     try:
-        # Read the tournament rounds sheet
-        df = read_public_sheet_as_df(TOURNAMENT_ROUNDS_CSV_URL)
+        # Read the indexed tournament rounds
+        snapshot = sheet_poller.get(TOURNAMENT_ROUNDS_CSV_URL)
         
-        if df is None:
+        if snapshot is None:
             print("ERROR: cant read user data or nonexistent")
             return None
-        else:
-            # Clean up column names (remove extra spaces)
-            df.columns = df.columns.str.strip()
-            
-            # Convert DataFrame to list of dictionaries
-            rounds_data = df.to_dict('records')
         
-        # Filter rounds where user is one of the 4 players
-        user_rounds = []
-        for round_data in rounds_data:
-            # Convert all values to strings for comparison (handle NaN values)
-            id1 = int(str(round_data.get('id1', '')).strip())
-            id2 = int(str(round_data.get('id2', '')).strip())
-            id3 = int(str(round_data.get('id3', '')).strip())
-            id4 = int(str(round_data.get('id4', '')).strip())
-            if user_id in [id1, id2, id3, id4]:
-                # Ensure all required fields are present and clean
-                clean_round = {
-                    'Round': round_data.get('Round', 0),
-                    'Net Number': round_data.get('Net Number', 0),
-                    'id1': id1,
-                    'id2': id2,
-                    'id3': id3,
-                    'id4': id4
-                }
-                user_rounds.append(clean_round)
-        return user_rounds
+        return [dict(round_data) for round_data in snapshot.data.by_player.get(user_id, ())]
         
     except Exception as e:
         print(f"Error getting tournament rounds: {e}")
         return None
 
+def get_latest_round(user_id):
+    """Get the most recent round a user is assigned to, or None"""
+    snapshot = sheet_poller.get(TOURNAMENT_ROUNDS_CSV_URL)
+    if snapshot is None:
+        print("ERROR: cant read tournament rounds")
+        return None
+    latest_round = snapshot.data.latest.get(user_id)
+    return dict(latest_round) if latest_round else None
+
+# Results are written to a local SQLite queue and posted to the Form by a
+# background worker, so a burst of submissions never waits on Google.
+submission_queue = SubmissionQueue(SUBMISSION_QUEUE_PATH, concurrency=SUBMISSION_CONCURRENCY,
+                                   min_interval=SUBMISSION_MIN_INTERVAL)
+
+@server.before_request
+def start_submission_queue():
+    # Drains anything left over from a previous run as soon as traffic arrives
+    submission_queue.start()
+
 def submit_results(round_data, results, username):
-    """Submit results to Google Sheets"""
+    """Queue results for submission to Google Sheets; returns the submission id or None"""
     try:
-        # Since we can't directly write to public Google Sheets via CSV export,
-        # we need an alternative approach. Here are the options:
-        
-        # Prepare the data that would be submitted
-
-        form_url = "https://docs.google.com/forms/d/e/1FAIpQLSe4-6_u7UkQ6bmrKQj8mxcqgDF82v6DDjDA2pk3WaJKIyzc8g/formResponse"
         new_row_data = {
             'entry.175605993': round_data['Round'],
             'entry.38731083': round_data['Net Number'],
@@ -186,20 +230,20 @@ def submit_results(round_data, results, username):
             'entry.1388039134': results[2],
             'entry.2146235891': username
         }
-        #entry.38731083
-
-        #print(f"Results to submit: {new_row_data}")
-        r = requests.post(form_url, data=new_row_data, timeout=10)
-        if r.status_code != 200 and r.status_code != 302:
-            print("Failed:", r.status_code)
-        time.sleep(0.15)  # be gentle; Forms may throttle
-        
-        #print("✅ Results logged successfully (using demo mode)")
-        return True
+        submission_id = submission_queue.enqueue(RESULTS_FORM_URL, new_row_data)
+        metrics.inc('submissions_enqueued_total')
+        return submission_id
         
     except Exception as e:
+        metrics.inc('submission_enqueue_errors_total')
         print(f"Error submitting results: {e}")
-        return False
+        return None
+
+# New rounds are pushed to browsers over server-sent events
+PUSH_CHECK_INTERVAL_MS = 500
+ROUND_EVENTS_MAX_SECONDS = 55  # streams are recycled so a worker thread is never held forever
+ROUND_EVENTS_KEEPALIVE_SECONDS = 15
+round_event_slots = threading.BoundedSemaphore(ROUND_EVENTS_MAX_STREAMS)
 
 # App layout - Include all components from start to avoid callback issues
 app.layout = dbc.Container([
@@ -207,7 +251,10 @@ app.layout = dbc.Container([
     dcc.Store(id='current-round-data'),
     dcc.Store(id='page-state', data='login'),  # Track which page we're on
     dcc.Store(id='submit-state', data={'submitted': False, 'round': None}),
-    dcc.Interval(id='refresh-interval', interval=10000, n_intervals=0),
+    dcc.Store(id='pools-version'),  # pools sheet digest pushed over /round-events
+    dcc.Interval(id='push-check', interval=PUSH_CHECK_INTERVAL_MS, n_intervals=0),  # client-side only
+    dcc.Interval(id='refresh-interval', interval=REFRESH_INTERVAL_MS, n_intervals=0),  # fallback if push is blocked
+    dcc.Interval(id='submission-poll', interval=2000, n_intervals=0, disabled=True),
     
     # Login page components
     html.Div([
@@ -262,7 +309,8 @@ app.layout = dbc.Container([
                 html.Div(id="tournament-content", children=[
                     dbc.Alert("No rounds available yet. Please wait for the tournament to begin.", 
                              color="info", className="text-center")
-                ])
+                ]),
+                html.Div(id="submission-progress", className="text-center text-secondary")
             ], width=12, md=10, lg=8, className="mx-auto")
         ])
     ], id="tournament-page", style={'display': 'none'}),
@@ -359,6 +407,15 @@ def create_tournament_content(user_data, round_data, submit_state=None):
         ])
     ], className="shadow")
 
+def timed_callback(fn):
+    """Record how long each run of a callback takes, labelled by the input that fired it"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trigger = callback_context.triggered[0]['prop_id'] if callback_context.triggered else 'initial'
+        with metrics.timer('callback_seconds', callback=fn.__name__, trigger=trigger):
+            return fn(*args, **kwargs)
+    return wrapper
+
 # Callback for page navigation and login
 @app.callback(
     [Output('login-page', 'style'),
@@ -369,12 +426,14 @@ def create_tournament_content(user_data, round_data, submit_state=None):
      Output('login-error', 'children')],
     [Input('login-button', 'n_clicks'),
      Input('refresh-interval', 'n_intervals'),
+     Input('pools-version', 'data'),
      Input('submit-state', 'data')],
     [State('email-input', 'value'),
      State('user-data', 'data'),
      State('current-round-data', 'data')]
 )
-def handle_navigation(n_clicks, n_intervals,  submit_state, email, user_data, current_round_data):
+@timed_callback
+def handle_navigation(n_clicks, n_intervals, pools_version, submit_state, email, user_data, current_round_data):
     ctx = callback_context
     
     # Default styles
@@ -388,8 +447,7 @@ def handle_navigation(n_clicks, n_intervals,  submit_state, email, user_data, cu
             user_info = check_user_exists(email)
             if user_info:
                 # Get current round data
-                rounds = get_tournament_rounds(user_info['row'])
-                latest_round = max(rounds, key=lambda x: x['Round']) if rounds else None
+                latest_round = get_latest_round(user_info['row'])
                 
                 if latest_round:
                     # Show tournament page
@@ -427,9 +485,8 @@ def handle_navigation(n_clicks, n_intervals,  submit_state, email, user_data, cu
     # User is logged in, check for new rounds
     if user_data:
         triggered_id = ctx.triggered[0]['prop_id'] if ctx.triggered else None
-        if triggered_id == 'refresh-interval.n_intervals':
-            rounds = get_tournament_rounds(user_data['row'])
-            latest_round = max(rounds, key=lambda x: x['Round']) if rounds else None
+        if triggered_id in ('refresh-interval.n_intervals', 'pools-version.data'):
+            latest_round = get_latest_round(user_data['row'])
             
             # Check if there's a new round
             if latest_round and (not current_round_data or latest_round['Round'] > current_round_data['Round']):
@@ -439,19 +496,9 @@ def handle_navigation(n_clicks, n_intervals,  submit_state, email, user_data, cu
                     user_data, latest_round, ""
                 )
             else:
-                # No new rounds, stay on current page
-                if current_round_data:
-                    return (
-                        {'display': 'none'}, {'display': 'block'},
-                        create_tournament_content(user_data, current_round_data, submit_state),
-                        user_data, current_round_data, ""
-                    )
-                else:
-                    return (
-                        {'display': 'none'}, {'display': 'block'},
-                        dbc.Alert("No rounds available yet. Please wait for the tournament to begin.", color="info", className="text-center"),
-                        user_data, None, ""
-                    )
+                # No new rounds: the page already shows the right content, so
+                # don't rebuild it or send it back to the browser
+                return (dash.no_update,) * 6
         elif triggered_id == 'submit-state.data':
             if current_round_data:
                 return (
@@ -496,15 +543,21 @@ def update_input_style(error_message):
      State('match2-radio', 'value'),
      State('match3-radio', 'value'),
      State('current-round-data', 'data'),
-     State('user-data', 'data')]
+     State('user-data', 'data')],
+    prevent_initial_call=True
 )
+@timed_callback
 def handle_submit(n_clicks, match1, match2, match3, round_data, user_data):
-    if not n_clicks or not round_data:
-        return "", "", {'submitted': False, 'round': None}
+    # a re-rendered button fires with n_clicks=None; leave submit-state alone so
+    # it doesn't re-trigger navigation and wipe the radios
+    if not n_clicks:
+        return "", "", dash.no_update, dash.no_update
+    if not round_data:
+        return "", "", {'submitted': False, 'round': None}, dash.no_update
     
     # Check if all matches have selections
     if not all([match1, match2, match3]):
-        return "Please select a winner for each match.", "", {'submitted': False, 'round': None}
+        return "Please select a winner for each match.", "", {'submitted': False, 'round': None}, dash.no_update
     
     # Convert selections to binary format (1 for left, 0 for right)
     results = [
@@ -513,11 +566,122 @@ def handle_submit(n_clicks, match1, match2, match3, round_data, user_data):
         1 if match3 == "left" else 0
     ]
     
-    # Submit results
-    submit_results(round_data, results, user_data['row'])
-    return "", "", {'submitted': True, 'round': round_data['Round']}, dbc.Alert("Thank you for submitting! Please wait for the next round.", 
+    # Queue results; the background worker posts them to the Form
+    submission_id = submit_results(round_data, results, user_data['row'])
+    if submission_id is None:
+        return "Couldn't save your results. Please try again.", "", {'submitted': False, 'round': None}, dash.no_update
+    return "", "", {'submitted': True, 'round': round_data['Round'], 'submission': submission_id}, dbc.Alert("Thank you for submitting! Please wait for the next round.", 
                        color="success", className="text-center")
 
+# Callback reporting queued submission progress until it is delivered
+@app.callback(
+    [Output('submission-progress', 'children'),
+     Output('submission-poll', 'disabled')],
+    [Input('submit-state', 'data'),
+     Input('submission-poll', 'n_intervals')],
+    prevent_initial_call=True
+)
+@timed_callback
+def update_submission_status(submit_state, n_intervals):
+    submission_id = (submit_state or {}).get('submission')
+    if not submission_id:
+        return "", True
+    status = submission_queue.status(submission_id)
+    if status is None:
+        return "", True
+    if status['status'] == SENT:
+        return "Results recorded.", True
+    if status['status'] == FAILED:
+        return "We couldn't send your results. Please let the tournament desk know.", True
+    if status['attempts'] > 0:
+        return "Google is busy; your results are saved and will be retried automatically.", False
+    return "Sending your results...", False
+
+# Server-sent events announcing the current pools sheet version. The digest is
+# used rather than the snapshot number so every worker process agrees on it.
+# Each stream holds a thread, so past ROUND_EVENTS_MAX_STREAMS a client gets a
+# 204, which tells EventSource to stop reconnecting; the page then falls back
+# to polling (see the push-fallback callback) and threads stay free for callbacks.
+@server.route('/round-events')
+def round_events():
+    if not round_event_slots.acquire(blocking=False):
+        metrics.inc('round_event_streams_refused_total')
+        return Response(status=204)
+    def stream():
+        deadline = time.monotonic() + ROUND_EVENTS_MAX_SECONDS
+        sent = None
+        yield 'retry: 1000\n\n'
+        while True:
+            snapshot = sheet_poller.get(TOURNAMENT_ROUNDS_CSV_URL)
+            if snapshot is not None and snapshot.digest != sent:
+                sent = snapshot.digest
+                yield f'data: {sent}\n\n'
+            else:
+                yield ': keepalive\n\n'
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            sheet_poller.wait_for_change(TOURNAMENT_ROUNDS_CSV_URL,
+                                         snapshot.version if snapshot else 0,
+                                         min(ROUND_EVENTS_KEEPALIVE_SECONDS, remaining))
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(round_event_slots.release)  # runs on client disconnect too
+    return response
+
+SHEET_NAMES = {USER_DATA_CSV_URL: 'registration', TOURNAMENT_ROUNDS_CSV_URL: 'pools'}
+
+@metrics.collector
+def app_metrics():
+    """Sheet poller and submission queue state, read when /metrics is scraped"""
+    poller = sheet_poller.stats()
+    samples = [('sheet_refreshes_total', 'counter', {'outcome': outcome}, poller[outcome])
+               for outcome in ('changed', 'unchanged', 'not_modified', 'errors')]
+    samples += [('sheet_snapshot_age_seconds', 'gauge', {'sheet': SHEET_NAMES.get(url, url)}, age)
+                for url, age in poller['age'].items()]
+    samples += [('sheet_snapshot_version', 'gauge', {'sheet': SHEET_NAMES.get(url, url)}, version)
+                for url, version in poller['versions'].items()]
+    samples += [('submissions', 'gauge', {'status': status}, count)
+                for status, count in submission_queue.counts().items()]
+    return samples
+
+# Prometheus scrape endpoint. Counters are per process, so with several
+# gunicorn workers each scrape sees whichever worker answered.
+@server.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Copy the latest pushed version into the store; runs in the browser, so it
+# costs the server nothing until the version actually changes.
+app.clientside_callback(
+    """
+    function(n, current) {
+        var version = window.poolsVersion;
+        if (version === undefined || version === current) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        return version;
+    }
+    """,
+    Output('pools-version', 'data'),
+    Input('push-check', 'n_intervals'),
+    State('pools-version', 'data')
+)
+
+# Turned away from /round-events (or the stream broke for good): poll faster
+app.clientside_callback(
+    """
+    function(n) {
+        if (!window.pushRefused) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        return %d;
+    }
+    """ % PUSH_FALLBACK_REFRESH_MS,
+    Output('refresh-interval', 'interval'),
+    Input('push-check', 'n_intervals')
+)
+
 # Custom CSS for mobile optimization
 app.index_string = '''
 <!DOCTYPE html>
@@ -589,6 +753,23 @@ app.index_string = '''
         </style>
     </head>
     <body>
+        <script>
+            // Listen for new-round announcements; EventSource reconnects on its own
+            // unless the server turns it away, and then the page polls instead
+            if (window.EventSource) {
+                var events = new EventSource('/round-events');
+                events.onmessage = function(e) {
+                    window.poolsVersion = e.data;
+                };
+                events.onerror = function() {
+                    if (events.readyState === EventSource.CLOSED) {
+                        window.pushRefused = true;
+                    }
+                };
+            } else {
+                window.pushRefused = true;
+            }
+        </script>
         {%app_entry%}
         <footer>
             {%config%}
@@ -0,0 +1,209 @@
+"""Scaling benchmarks for the tournament manager and the app's sheet parsing.
+
+Builds synthetic tournaments the way the notebook's "Testing Optimizer" cell
+does (hidden true Elos, results drawn from the Elo model, seeded RNG), at each
+requested size, and times every stage a round goes through: parsing and
+deduplicating the results sheet, fitting ratings, matchmaking, and the app's
+sheet indexes. Each (stage, size) is written as one JSON line, so runs can be
+diffed or compared against a saved baseline.
+
+    python benchmarks.py --players 16,64,200 --rounds 10 --out bench.jsonl
+    python benchmarks.py --players 200 --baseline bench.jsonl   # exit 1 on regressions
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from io import StringIO
+
+import pandas as pd
+
+import sheet_standin
+import settings
+from tourney.matchmaking import anneal_matchings, generate_matchings, pair_count_matrix
+from tourney.models import Game, Player
+from tourney.ratings import fit_rating_state, optimize_ratings, update_rating_state
+from tourney.results import df_to_game_table, df_to_games, remove_duplicates
+
+STAGES = ['parse_results', 'remove_duplicates', 'df_to_games', 'df_to_game_table', 'optimize_ratings',
+          'fit_rating_state', 'update_rating_state', 'pair_counts', 'anneal_matchings', 'generate_matchings',
+          'registration_index', 'round_index']
+
+
+def synthetic_tournament(num_players, num_rounds, dup_rate=0.5, seed=0):
+    """Sheets (as CSV text) and true ratings for a random tournament.
+
+    Pools are drawn at random each round; every net reports three games sampled
+    from the Elo model, and each of the other three players re-submits the same
+    report with probability `dup_rate`, like a real results sheet.
+    """
+    rng = random.Random(seed)
+    ids = list(range(2, num_players + 2))  # registration sheet row numbers
+    true_elos = {pid: min(max(rng.gauss(1200, 300), 100), 1900) for pid in ids}
+
+    pools = sheet_standin.Sheet(['Timestamp'] + list(sheet_standin.FORMS[settings.POOLS_FORM_ID][1].values()))
+    results = sheet_standin.Sheet(['Timestamp'] + list(sheet_standin.FORMS[settings.RESULTS_FORM_ID][1].values()))
+    for round_num in range(1, num_rounds + 1):
+        rng.shuffle(ids)
+        nets = [ids[k:k + 4] for k in range(0, num_players, 4)]
+        for net, (a, b, c, d) in enumerate(nets, 1):
+            pools.append({'Round': round_num, 'Net Number': net, 'id1': a, 'id2': b, 'id3': c, 'id4': d})
+            row = {'Timestamp': sheet_standin.timestamp(), 'Round': round_num, 'Net_number': net,
+                   'id1': a, 'id2': b, 'id3': c, 'id4': d}
+            # Same three games df_to_games unpacks: a partners b, then c, then d
+            for k, (p2, p3, p4) in enumerate([(b, c, d), (c, b, d), (d, b, c)], 1):
+                diff = 0.5 * (true_elos[a] + true_elos[p2] - true_elos[p3] - true_elos[p4])
+                row[f'Match{k}Result'] = int(rng.random() < 1 / (1 + 10 ** (-diff / 400)))
+            for reporter in (a, b, c, d):
+                if reporter == a or rng.random() < dup_rate:
+                    results.append(dict(row, Reporter=f'player{reporter - 2}@ucla.edu'))
+        pools.append({'Round': round_num, 'Net Number': 0, 'id1': len(nets), 'id2': 0, 'id3': 0, 'id4': 0})
+
+    return {
+        'registration': sheet_standin.synthetic_registration(num_players, seed).to_csv(),
+        'pools': pools.to_csv(),
+        'results': results.to_csv(),
+        'true_elos': true_elos,
+    }
+
+
+def time_call(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # the manager prints a lot
+            fn()
+        times.append(time.perf_counter() - start)
+    return {'seconds': statistics.median(times), 'min_seconds': min(times), 'repeat': repeat}
+
+
+def load_app():
+    """Import app.py for its sheet parsers, or None if the Dash stack isn't installed"""
+    # app.py opens its submission queue at import; keep that out of the working tree
+    settings.SUBMISSION_QUEUE_PATH = os.path.join(tempfile.mkdtemp(), 'bench-submissions.db')
+    try:
+        import app
+    except ImportError as e:
+        print(f"Skipping app stages: {e}", file=sys.stderr)
+        return None
+    return app
+
+
+def run_size(app, num_players, num_rounds, args):
+    """Yield one result dict per stage for a single tournament size"""
+    data = synthetic_tournament(num_players, num_rounds, args.dup_rate, args.seed)
+    results_df = pd.read_csv(StringIO(data['results']))
+    clean, _ = remove_duplicates(results_df)
+    table = df_to_game_table(clean)
+    last_round = table.round == num_rounds
+
+    def make_players():
+        return [Player(pid, f'Player {pid}', '', 600 + 100 * (pid % 9)) for pid in sorted(data['true_elos'])]
+
+    players = make_players()
+    with contextlib.redirect_stdout(io.StringIO()):
+        before_last = fit_rating_state(players, table.select(~last_round))
+        fit_rating_state(players, table)
+    # Matchmaking sees the pools of the last two rounds, as make_new_round does
+    pools_df = pd.read_csv(StringIO(data['pools']))
+    recent_pools = pools_df[(pools_df['Net Number'] > 0) & (pools_df['Round'] >= num_rounds - 1)]
+    recent = pair_count_matrix(players, [Game(r.Round, r.id1, r.id2, r.id3, r.id4, -1)
+                                         for r in recent_pools.itertuples()])
+
+    stages = {
+        'parse_results': lambda: pd.read_csv(StringIO(data['results'])),
+        'remove_duplicates': lambda: remove_duplicates(results_df),
+        'df_to_games': lambda: df_to_games(clean),
+        'df_to_game_table': lambda: df_to_game_table(clean),
+        'optimize_ratings': lambda: optimize_ratings(make_players(), table),
+        'fit_rating_state': lambda: fit_rating_state(make_players(), table),
+        'update_rating_state': lambda: update_rating_state(before_last, make_players(), table.select(last_round)),
+        'pair_counts': lambda: pair_count_matrix(players, table),
+        'anneal_matchings': lambda: anneal_matchings(players, recent, num_rounds + 1, rating_window=6),
+        'generate_matchings': lambda: generate_matchings(players, recent, num_rounds + 1, rating_window=6,
+                                                         time_limit=args.match_time_limit,
+                                                         num_workers=args.solver_workers),
+    }
+    if app is not None:
+        stages['registration_index'] = lambda: app.build_registration_index(pd.read_csv(StringIO(data['registration'])))
+        stages['round_index'] = lambda: app.build_round_index(pd.read_csv(StringIO(data['pools'])))
+
+    for stage in args.stages:
+        if stage not in stages:
+            continue
+        record = {'stage': stage, 'players': num_players, 'rounds': num_rounds, 'games': len(table),
+                  'result_rows': len(results_df), 'dup_rate': args.dup_rate}
+        try:
+            record.update(time_call(stages[stage], args.repeat))
+        except Exception as e:  # e.g. no valid matching at this size; keep benchmarking the rest
+            record['error'] = f"{type(e).__name__}: {e}"
+        yield record
+
+
+def compare(records, baseline_path, tolerance):
+    """Print stages that got slower than the baseline by more than `tolerance`; return how many"""
+    with open(baseline_path) as f:
+        baseline = {(r['stage'], r['players'], r['rounds']): r for r in map(json.loads, f) if 'seconds' in r}
+    regressions = 0
+    for record in records:
+        base = baseline.get((record['stage'], record['players'], record['rounds']))
+        if base is None or 'seconds' not in record:
+            continue
+        ratio = record['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        if ratio > 1 + tolerance:
+            regressions += 1
+            print(f"REGRESSION {record['stage']} players={record['players']} rounds={record['rounds']}: "
+                  f"{base['seconds']:.4f}s -> {record['seconds']:.4f}s ({ratio:.2f}x)", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', default='16,64,200', help='comma-separated tournament sizes (multiples of 4)')
+    parser.add_argument('--rounds', default='10', help='comma-separated numbers of played rounds')
+    parser.add_argument('--dup-rate', type=float, default=0.5, help='chance each other player re-reports a net')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated subset of: ' + ', '.join(STAGES))
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage; the median is reported')
+    parser.add_argument('--match-time-limit', type=float, default=10.0, help='CP-SAT time limit per solve')
+    parser.add_argument('--solver-workers', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=101)
+    parser.add_argument('--out', help='write JSON lines here instead of stdout')
+    parser.add_argument('--baseline', help='JSON lines from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs the baseline')
+    args = parser.parse_args()
+    args.stages = args.stages.split(',')
+
+    app = load_app() if {'registration_index', 'round_index'} & set(args.stages) else None
+    environment = {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()}
+    out = open(args.out, 'w') if args.out else sys.stdout
+    records = []
+    try:
+        for num_players in [int(p) for p in args.players.split(',')]:
+            if num_players % 4:
+                parser.error(f"--players sizes must be multiples of 4, got {num_players}")
+            for num_rounds in [int(r) for r in args.rounds.split(',')]:
+                for record in run_size(app, num_players, num_rounds, args):
+                    record.update(environment)
+                    records.append(record)
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                    print(f"{record['stage']:>20} players={num_players:<5} rounds={num_rounds:<4} "
+                          + (f"{record['seconds'] * 1000:10.2f} ms" if 'seconds' in record else record['error']),
+                          file=sys.stderr)
+    finally:
+        if args.out:
+            out.close()
+
+    if args.baseline and compare(records, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+# Read by gunicorn from the working directory: gunicorn app:server
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # gunicorn loads this before app.py's directory is on the path
+import settings
+
+# Each /round-events stream holds a thread for up to a minute. A worker serves
+# at most ROUND_EVENTS_MAX_STREAMS of them (the rest poll instead, see app.py)
+# and gets CALLBACK_THREADS more on top, so page loads, callbacks and /metrics
+# never queue behind the streams. The defaults, 2 workers x (100 + 50) threads,
+# push to 200 phones; for bigger events raise ROUND_EVENTS_MAX_STREAMS or
+# WEB_CONCURRENCY, or leave them and let the extra phones poll.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = settings.ROUND_EVENTS_MAX_STREAMS + settings.CALLBACK_THREADS
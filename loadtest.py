@@ -0,0 +1,318 @@
+"""Load generator for the Dash app: N simulated players on their phones.
+
+Each simulated player loads the page, logs in through the login-button
+callback, then polls the refresh-interval callback on its cadence and submits
+results through handle_submit whenever a new round shows up, exactly as the
+browser would (same callback payloads, chained callbacks included). With
+--push each player also holds a /round-events stream and reacts to pushes.
+Rounds can be published into the sheet stand-in while the test runs, so the
+whole loop is exercised without the manager.
+
+    python sheet_standin.py --players 200 --latency-ms 300 &
+    GOOGLE_BASE_URL=http://127.0.0.1:8060 python app.py &
+    python loadtest.py --clients 200 --duration 300 --refresh-ms 5000 --publish-every 60 --push
+
+Reports p50/p95/p99 latency per callback, throughput, and how many fetches
+and form posts reached the (stand-in) Google endpoints during the run.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+import requests
+
+import settings
+import sheet_standin
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}  # callback name -> [seconds]
+        self.errors = {}
+        self.counters = {'logins': 0, 'rounds_seen': 0, 'submissions': 0, 'pushes': 0}
+
+    def observe(self, name, seconds, error=False):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def summary(self, elapsed):
+        with self.lock:
+            callbacks = {}
+            for name, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                callbacks[name] = {
+                    'count': len(values),
+                    'errors': self.errors.get(name, 0),
+                    'p50_ms': percentile(values, 0.50) * 1000,
+                    'p95_ms': percentile(values, 0.95) * 1000,
+                    'p99_ms': percentile(values, 0.99) * 1000,
+                    'max_ms': values[-1] * 1000,
+                }
+            total = sum(len(v) for v in self.latencies.values())
+            return {'elapsed_s': elapsed, 'requests': total, 'throughput_rps': total / elapsed if elapsed else 0.0,
+                    'callbacks': callbacks, 'counters': dict(self.counters)}
+
+
+class DashCallbacks:
+    """Callback definitions read from the running app's /_dash-dependencies"""
+
+    def __init__(self, base_url):
+        r = requests.get(f"{base_url}/_dash-dependencies", timeout=10)
+        r.raise_for_status()
+        self.deps = [dep for dep in r.json() if not dep.get('clientside_function')]
+
+    def by_input(self, prop_id):
+        for dep in self.deps:
+            if any(f"{i['id']}.{i['property']}" == prop_id for i in dep['inputs']):
+                return dep
+        raise KeyError(f"no server callback takes {prop_id} as input")
+
+    @staticmethod
+    def payload(dep, values, changed):
+        """Request body for `dep` with component values from `values` ('id.prop' -> value)"""
+        output = dep['output']
+        multi = output.startswith('..')  # multi-output ids look like "..a.prop...b.prop.."
+        outputs = [dict(zip(('id', 'property'), o.rsplit('.', 1))) for o in output.strip('.').split('...')]
+        def props(items):
+            return [{'id': i['id'], 'property': i['property'], 'value': values.get(f"{i['id']}.{i['property']}")}
+                    for i in items]
+        return {
+            'output': output,
+            'outputs': outputs if multi else outputs[0],
+            'inputs': props(dep['inputs']),
+            'state': props(dep['state']),
+            'changedPropIds': [changed],
+        }
+
+
+class Player(threading.Thread):
+    """One phone: login, poll, submit, and optionally listen for pushed rounds"""
+
+    def __init__(self, n, args, callbacks, stats, deadline):
+        super().__init__(daemon=True, name=f"player-{n}")
+        self.args = args
+        self.callbacks = callbacks
+        self.stats = stats
+        self.deadline = deadline
+        self.rng = random.Random(args.seed * 100003 + n)
+        self.session = requests.Session()
+        self.values = {
+            'email-input.value': args.email_pattern.format(i=n),
+            'login-button.n_clicks': None,
+            'refresh-interval.n_intervals': 0,
+            'pools-version.data': None,
+            'submit-state.data': {'submitted': False, 'round': None},
+            'user-data.data': None,
+            'current-round-data.data': None,
+            'submission-poll.n_intervals': 0,
+        }
+        self.pushed = threading.Event()
+        self.pushed_version = None
+        self.submitted_round = None
+        self.status_poll_at = None
+
+    def call(self, name, trigger, values=None):
+        dep = self.callbacks.by_input(trigger)
+        body = DashCallbacks.payload(dep, dict(self.values, **(values or {})), trigger)
+        start = time.perf_counter()
+        error = True
+        try:
+            r = self.session.post(f"{self.args.url}/_dash-update-component", json=body, timeout=60)
+            error = r.status_code not in (200, 204)
+            response = r.json().get('response', {}) if r.status_code == 200 else {}
+        except (requests.RequestException, ValueError):
+            response = {}
+        self.stats.observe(name, time.perf_counter() - start, error)
+        for cid, props in response.items():
+            for prop, value in props.items():
+                self.values[f"{cid}.{prop}"] = value
+        return response
+
+    def listen(self):
+        # Like the page's EventSource: reconnect whenever the server recycles the stream
+        while time.monotonic() < self.deadline:
+            try:
+                with self.session.get(f"{self.args.url}/round-events", stream=True, timeout=(5, 30)) as r:
+                    if r.status_code == 204:  # server is at its stream cap; the page would poll instead
+                        self.stats.count('push_refused')
+                        return
+                    for line in r.iter_lines(decode_unicode=True):
+                        if line and line.startswith('data: '):
+                            self.pushed_version = line[len('data: '):]
+                            self.pushed.set()
+                        if time.monotonic() >= self.deadline:
+                            return
+            except requests.RequestException:
+                time.sleep(1)
+
+    def maybe_submit(self):
+        round_data = self.values.get('current-round-data.data')
+        if not round_data or round_data.get('Round') == self.submitted_round:
+            return
+        self.stats.count('rounds_seen')
+        self.submitted_round = round_data['Round']
+        if self.rng.random() >= self.args.report_rate:
+            return
+        time.sleep(self.rng.uniform(0, self.args.think_s))  # playing the games
+        choice = lambda: self.rng.choice(['left', 'right'])
+        self.call('submit', 'submit-button.n_clicks', {
+            'submit-button.n_clicks': 1,
+            'match1-radio.value': choice(), 'match2-radio.value': choice(), 'match3-radio.value': choice(),
+        })
+        self.stats.count('submissions')
+        # The new submit-state fires both of these in the browser
+        self.call('submit_refresh', 'submit-state.data')
+        self.call('submission_status', 'submission-poll.n_intervals')
+        self.status_poll_at = time.monotonic() + 2.0
+
+    def run(self):
+        time.sleep(self.rng.uniform(0, self.args.ramp_s))
+        start = time.perf_counter()
+        try:
+            self.session.get(f"{self.args.url}/", timeout=30).raise_for_status()
+            self.session.get(f"{self.args.url}/_dash-layout", timeout=30).raise_for_status()
+            self.stats.observe('page_load', time.perf_counter() - start)
+        except requests.RequestException:
+            self.stats.observe('page_load', time.perf_counter() - start, error=True)
+            return
+        self.call('login', 'login-button.n_clicks', {'login-button.n_clicks': 1})
+        if not self.values.get('user-data.data'):
+            return
+        self.stats.count('logins')
+        if self.args.push:
+            threading.Thread(target=self.listen, daemon=True).start()
+
+        refresh_s = self.args.refresh_ms / 1000
+        next_refresh = time.monotonic() + refresh_s
+        while True:
+            self.maybe_submit()
+            now = time.monotonic()
+            if now >= self.deadline:
+                return
+            wake = min(next_refresh, self.status_poll_at or next_refresh, self.deadline)
+            if self.pushed.wait(max(0.0, wake - now)):
+                self.pushed.clear()
+                if self.pushed_version != self.values['pools-version.data']:
+                    self.stats.count('pushes')
+                    self.values['pools-version.data'] = self.pushed_version
+                    self.call('push', 'pools-version.data')
+                continue
+            now = time.monotonic()
+            if self.status_poll_at is not None and now >= self.status_poll_at:
+                self.values['submission-poll.n_intervals'] += 1
+                response = self.call('submission_status', 'submission-poll.n_intervals')
+                done = response.get('submission-poll', {}).get('disabled', True)
+                self.status_poll_at = None if done else now + 2.0
+            if now >= next_refresh:
+                self.values['refresh-interval.n_intervals'] += 1
+                self.call('refresh', 'refresh-interval.n_intervals')
+                next_refresh = now + refresh_s
+
+
+def publish_rounds(args, num_players, stop):
+    """Post a random round of pools (plus its marker row) to the stand-in every publish_every seconds"""
+    fields = {column: entry for entry, column in sheet_standin.FORMS[settings.POOLS_FORM_ID][1].items()}
+    url = f"{args.standin}/forms/d/e/{settings.POOLS_FORM_ID}/formResponse"
+    rng = random.Random(args.seed)
+    ids = [n + 2 for n in range(num_players)]  # registration row numbers of the simulated players
+    round_num = args.first_round
+    while not stop.wait(0 if round_num == args.first_round else args.publish_every):
+        rng.shuffle(ids)
+        nets = [ids[k:k + 4] for k in range(0, len(ids) - 3, 4)]
+        rows = [(net, pids) for net, pids in enumerate(nets, 1)] + [(0, [len(nets), 0, 0, 0])]
+        for net, pids in rows:
+            data = {fields['Round']: round_num, fields['Net Number']: net}
+            data.update({fields[f'id{k}']: pid for k, pid in enumerate(pids, 1)})
+            requests.post(url, data=data, timeout=10)
+        print(f"Published round {round_num} ({len(nets)} nets)", file=sys.stderr)
+        round_num += 1
+
+
+def standin_counters(args):
+    if not args.standin:
+        return None
+    try:
+        return requests.get(f"{args.standin}/_standin/stats", timeout=5).json()['counters']
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help='the Dash app')
+    parser.add_argument('--standin', default='http://127.0.0.1:8060',
+                        help="sheet stand-in, for upstream counts and publishing ('' to disable)")
+    parser.add_argument('--clients', type=int, default=50, help='simulated players')
+    parser.add_argument('--duration', type=float, default=120, help='seconds to run')
+    parser.add_argument('--ramp-s', type=float, default=10, help='players log in spread over this many seconds')
+    parser.add_argument('--refresh-ms', type=int, default=settings.REFRESH_INTERVAL_MS,
+                        help="refresh-interval cadence; defaults to the app's")
+    parser.add_argument('--push', action='store_true', help='hold a /round-events stream per player')
+    parser.add_argument('--think-s', type=float, default=20, help='max seconds between seeing a round and submitting')
+    parser.add_argument('--report-rate', type=float, default=1.0, help='fraction of players who report each round')
+    parser.add_argument('--publish-every', type=float, help='publish a random round to the stand-in this often')
+    parser.add_argument('--first-round', type=int, default=1)
+    parser.add_argument('--email-pattern', default='player{i}@ucla.edu',
+                        help="login email of player i (the stand-in's synthetic registrations)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the summary here')
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+    args.standin = args.standin.rstrip('/')
+    if args.publish_every and not args.standin:
+        parser.error('--publish-every needs --standin')
+
+    callbacks = DashCallbacks(args.url)
+    stats = Stats()
+    before = standin_counters(args)
+    stop = threading.Event()
+    if args.publish_every:
+        threading.Thread(target=publish_rounds, args=(args, args.clients, stop), daemon=True).start()
+
+    start = time.monotonic()
+    deadline = start + args.duration
+    players = [Player(n, args, callbacks, stats, deadline) for n in range(args.clients)]
+    for player in players:
+        player.start()
+    for player in players:
+        player.join(max(0.0, deadline - time.monotonic()) + 60)
+    stop.set()
+
+    summary = stats.summary(time.monotonic() - start)
+    summary['config'] = {k: v for k, v in vars(args).items() if k != 'json'}
+    after = standin_counters(args)
+    if before is not None and after is not None:
+        summary['upstream'] = {k: after[k] - before.get(k, 0) for k in after}
+
+    print(f"{args.clients} players for {summary['elapsed_s']:.0f}s: {summary['requests']} callbacks, "
+          f"{summary['throughput_rps']:.1f}/s")
+    print(f"{'callback':>18} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, c in summary['callbacks'].items():
+        print(f"{name:>18} {c['count']:7d} {c['errors']:7d} {c['p50_ms']:9.1f} {c['p95_ms']:9.1f} "
+              f"{c['p99_ms']:9.1f} {c['max_ms']:9.1f}")
+    print('counters:', summary['counters'])
+    if 'upstream' in summary:
+        print('upstream (stand-in):', summary['upstream'])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Process-wide timings and counters, rendered in the Prometheus text format.
+
+The Dash app serves the default registry at /metrics; the tournament manager
+exposes the same registry as TourneyManager.stats. Upstream request latency
+comes from the shared transport's histograms, so it's never recorded twice.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import transport
+from transport import LatencyHistogram
+
+PREFIX = 'tourney_'
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> LatencyHistogram
+        self._counters = {}  # (name, labels) -> float
+        self._gauges = {}  # (name, labels) -> float
+        self._collectors = []  # () -> [(name, kind, labels, value)], read at render time
+
+    def observe(self, name, seconds, error=False, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds, error)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the block into histogram `name`; a raised exception counts as an error"""
+        start = time.perf_counter()
+        error = True
+        try:
+            yield
+            error = False
+        finally:
+            self.observe(name, time.perf_counter() - start, error, **labels)
+
+    def collector(self, fn):
+        """Register fn() -> [(name, 'counter'|'gauge'|'histogram', labels, value)]; usable as a decorator.
+
+        Histogram values are LatencyHistogram.snapshot() dicts.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def _samples(self):
+        with self._lock:
+            samples = [(name, 'histogram', dict(labels), h.snapshot()) for (name, labels), h in self._histograms.items()]
+            samples += [(name, 'counter', dict(labels), v) for (name, labels), v in self._counters.items()]
+            samples += [(name, 'gauge', dict(labels), v) for (name, labels), v in self._gauges.items()]
+        for fn in self._collectors:
+            try:
+                samples += list(fn())
+            except Exception as e:
+                print(f"Error collecting metrics from {getattr(fn, '__name__', fn)}: {e}")
+        return samples
+
+    def snapshot(self):
+        """Plain dict of everything, for printing in a notebook: name -> [(labels, value)]"""
+        out = {}
+        for name, kind, labels, value in self._samples():
+            if kind == 'histogram':
+                value = {'count': value['count'], 'sum': value['sum'], 'errors': value['errors'],
+                         'mean': value['sum'] / value['count'] if value['count'] else None}
+            out.setdefault(name, []).append((labels, value))
+        return out
+
+    def render(self):
+        """Prometheus text exposition format"""
+        by_name = {}
+        for name, kind, labels, value in self._samples():
+            by_name.setdefault((name, kind), []).append((sorted(labels.items()), value))
+        lines = []
+        for (name, kind), series in sorted(by_name.items()):
+            metric = PREFIX + name
+            lines.append(f'# TYPE {metric} {kind}')
+            errors = []
+            for labels, value in series:
+                if kind != 'histogram':
+                    lines.append(f'{metric}{_format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in value['buckets'].items():
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{_format_labels(labels, [("le", le)])} {cumulative}')
+                lines.append(f'{metric}_sum{_format_labels(labels)} {value["sum"]}')
+                lines.append(f'{metric}_count{_format_labels(labels)} {value["count"]}')
+                errors.append(f'{metric}_errors_total{_format_labels(labels)} {value["errors"]}')
+            if errors:
+                lines.append(f'# TYPE {metric}_errors_total counter')
+                lines += errors
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+@REGISTRY.collector
+def upstream_requests():
+    return [('upstream_request_seconds', 'histogram', {'endpoint': endpoint}, snapshot)
+            for endpoint, snapshot in transport.stats().items()]
+
+
+def observe(name, seconds, error=False, **labels):
+    REGISTRY.observe(name, seconds, error, **labels)
+
+
+def inc(name, amount=1, **labels):
+    REGISTRY.inc(name, amount, **labels)
+
+
+def gauge(name, value, **labels):
+    REGISTRY.gauge(name, value, **labels)
+
+
+def timer(name, **labels):
+    return REGISTRY.timer(name, **labels)
+
+
+def collector(fn):
+    return REGISTRY.collector(fn)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def snapshot():
+    return REGISTRY.snapshot()
@@ -0,0 +1,66 @@
+import os
+
+# Everything that talks to Google builds its URLs from this base, so the app
+# and the manager can be pointed at the local stand-in (sheet_standin.py):
+#   GOOGLE_BASE_URL=http://127.0.0.1:8060 python app.py
+GOOGLE_BASE_URL = os.environ.get('GOOGLE_BASE_URL', 'https://docs.google.com').rstrip('/')
+
+# Google Sheets configuration - Using public CSV export URLs
+USER_SHEET_ID = '1KmJBO5oKwygn-2AzwX-hS1wGeQMmLwyizFqtsSZo7_w'
+USER_DATA_GID = '900351397'
+
+TOURNAMENT_SHEET_ID = '1srq_lb7-c601uE3gSumhWltxsjXi3HRUVRHpdkgLu-w'
+TOURNAMENT_GID = '1153687443'
+
+RESULTS_SHEET_ID = '1vuQ394gU_CSNEO-U0ZFVRTNC1jIWV1BT_yjGqoQQPOk'
+RESULTS_GID = '0'
+
+# Google Forms that append rows to the sheets above
+RESULTS_FORM_ID = '1FAIpQLSe4-6_u7UkQ6bmrKQj8mxcqgDF82v6DDjDA2pk3WaJKIyzc8g'
+POOLS_FORM_ID = '1FAIpQLSfaqSgDwyCfvwAM1gSKc7IbGbr14ePMwEJmcBx_fcJB9YVDAg'
+
+
+def sheet_csv_url(sheet_id, gid=None):
+    url = f"{GOOGLE_BASE_URL}/spreadsheets/d/{sheet_id}/export?format=csv"
+    return f"{url}&gid={gid}" if gid is not None else url
+
+
+def form_response_url(form_id):
+    return f"{GOOGLE_BASE_URL}/forms/d/e/{form_id}/formResponse"
+
+
+# CSV export URLs for public sheets
+USER_DATA_CSV_URL = sheet_csv_url(USER_SHEET_ID, USER_DATA_GID)
+TOURNAMENT_ROUNDS_CSV_URL = sheet_csv_url(TOURNAMENT_SHEET_ID, TOURNAMENT_GID)
+RESULTS_CSV_URL = sheet_csv_url(RESULTS_SHEET_ID, RESULTS_GID)
+FORM_RESPONSES_CSV_URL = sheet_csv_url(USER_SHEET_ID)  # first tab, read by the manager
+
+RESULTS_FORM_URL = form_response_url(RESULTS_FORM_ID)
+POOLS_FORM_URL = form_response_url(POOLS_FORM_ID)
+
+# A round is only shown once its "published" marker row (net 0) is in and all
+# its nets are posted. Set to 0 for a pools sheet from before markers existed:
+# rounds then stay hidden only once some round has a marker.
+ROUND_MARKERS_REQUIRED = os.environ.get('ROUND_MARKERS_REQUIRED', '1') != '0'
+
+# How often (seconds) the background poller re-downloads each sheet
+USER_DATA_POLL_INTERVAL = float(os.environ.get('USER_DATA_POLL_INTERVAL', '30'))
+TOURNAMENT_ROUNDS_POLL_INTERVAL = float(os.environ.get('TOURNAMENT_ROUNDS_POLL_INTERVAL', '3'))
+
+SUBMISSION_QUEUE_PATH = os.environ.get('SUBMISSION_QUEUE_PATH', 'submissions.db')
+SUBMISSION_CONCURRENCY = int(os.environ.get('SUBMISSION_CONCURRENCY', '4'))
+SUBMISSION_MIN_INTERVAL = float(os.environ.get('SUBMISSION_MIN_INTERVAL', '0.15'))  # be gentle; Forms may throttle
+
+# The tournament manager appends its state here after every round and check-in
+# change; TourneyManager.restore() (python -m tourney --restore) reads it back
+CHECKPOINT_PATH = os.environ.get('CHECKPOINT_PATH', 'tourney.ckpt')
+
+# New rounds are pushed to browsers over server-sent events; the interval poll
+# is only a slow safety net for clients whose connection can't hold a stream.
+REFRESH_INTERVAL_MS = int(os.environ.get('REFRESH_INTERVAL_MS', '60000'))
+# Each stream holds a worker thread, so each worker process serves at most this
+# many; the rest are turned away and poll every PUSH_FALLBACK_REFRESH_MS instead.
+# gunicorn.conf.py sizes its thread pool from this plus CALLBACK_THREADS.
+ROUND_EVENTS_MAX_STREAMS = int(os.environ.get('ROUND_EVENTS_MAX_STREAMS', '100'))
+CALLBACK_THREADS = int(os.environ.get('CALLBACK_THREADS', '50'))  # always left for callbacks, pages and /metrics
+PUSH_FALLBACK_REFRESH_MS = int(os.environ.get('PUSH_FALLBACK_REFRESH_MS', '5000'))
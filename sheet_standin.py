@@ -0,0 +1,211 @@
+"""Local stand-in for the Google Sheets/Forms endpoints the tournament uses.
+
+Serves the three CSV exports and accepts the two formResponse posts with the
+real entry ids, appending rows the same way the linked Forms do. Latency,
+errors and throttling can be injected so the app and the manager can be load
+tested without touching the production sheets.
+
+    python sheet_standin.py --players 200 --latency-ms 300 --error-rate 0.02
+    GOOGLE_BASE_URL=http://127.0.0.1:8060 python app.py
+"""
+import argparse
+import csv
+import hashlib
+import io
+import random
+import threading
+import time
+from datetime import datetime
+
+from flask import Flask, Response, request
+
+import settings
+
+# Form id -> (sheet id, {entry field: sheet column}), mirroring the live Forms
+FORMS = {
+    settings.RESULTS_FORM_ID: (settings.RESULTS_SHEET_ID, {
+        'entry.175605993': 'Round',
+        'entry.38731083': 'Net_number',
+        'entry.1960261060': 'id1',
+        'entry.791831527': 'id2',
+        'entry.40405346': 'id3',
+        'entry.751547352': 'id4',
+        'entry.1089736874': 'Match1Result',
+        'entry.1449374216': 'Match2Result',
+        'entry.1388039134': 'Match3Result',
+        'entry.2146235891': 'Reporter',
+    }),
+    settings.POOLS_FORM_ID: (settings.TOURNAMENT_SHEET_ID, {
+        'entry.1134473475': 'Round',
+        'entry.1834803213': 'Net Number',
+        'entry.1013925837': 'id1',
+        'entry.2138865174': 'id2',
+        'entry.463748120': 'id3',
+        'entry.1477352260': 'id4',
+    }),
+}
+
+REGISTRATION_COLUMNS = ['Timestamp', 'UCLA email', 'First and Last name', 'What is your skill level']
+
+
+class Sheet:
+    """An append-only table rendered to CSV the way the export endpoint does"""
+
+    def __init__(self, columns, rows=()):
+        self.columns = list(columns)
+        self.rows = [list(row) for row in rows]
+        self._csv = None
+
+    def append(self, values):
+        self.rows.append([values.get(col, '') for col in self.columns])
+        self._csv = None
+
+    def to_csv(self):
+        if self._csv is None:
+            out = io.StringIO()
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow(self.columns)
+            writer.writerows(self.rows)
+            self._csv = out.getvalue()
+        return self._csv
+
+
+def timestamp():
+    return datetime.now().strftime('%m/%d/%Y %H:%M:%S')
+
+
+def synthetic_registration(num_players, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(num_players):
+        skill = rng.randint(1, 9)
+        rows.append([timestamp(), f'player{i}@ucla.edu', f'Player {i}', f'{skill} - self reported'])
+    return Sheet(REGISTRATION_COLUMNS, rows)
+
+
+def load_sheet(path):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        return Sheet(next(reader), reader)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+def create_app(sheets, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rps=None, seed=None):
+    """Build the stand-in Flask app around `sheets` (sheet id -> Sheet)"""
+    app = Flask(__name__)
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    bucket = TokenBucket(throttle_rps, max(throttle_rps, 1)) if throttle_rps else None
+    counters = {'exports': 0, 'not_modified': 0, 'form_posts': 0, 'errors': 0, 'throttled': 0}
+
+    def inject_faults():
+        """Sleep for the configured latency; return an error response to send instead, if any"""
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+        if bucket is not None and not bucket.take():
+            counters['throttled'] += 1
+            return Response('Too Many Requests', status=429)
+        if error_rate and rng.random() < error_rate:
+            counters['errors'] += 1
+            return Response('Injected error', status=500)
+        return None
+
+    @app.route('/spreadsheets/d/<sheet_id>/export')
+    def export(sheet_id):
+        failure = inject_faults()
+        if failure is not None:
+            return failure
+        sheet = sheets.get(sheet_id)
+        if sheet is None:
+            return Response('Not Found', status=404)
+        with lock:
+            body = sheet.to_csv()
+        etag = '"' + hashlib.blake2b(body.encode('utf-8'), digest_size=16).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            counters['not_modified'] += 1
+            return Response(status=304, headers={'ETag': etag})
+        counters['exports'] += 1
+        return Response(body, mimetype='text/csv', headers={'ETag': etag})
+
+    @app.route('/forms/d/e/<form_id>/formResponse', methods=['POST'])
+    def form_response(form_id):
+        failure = inject_faults()
+        if failure is not None:
+            return failure
+        if form_id not in FORMS:
+            return Response('Not Found', status=404)
+        sheet_id, fields = FORMS[form_id]
+        values = {column: request.form.get(entry, '') for entry, column in fields.items()}
+        values['Timestamp'] = timestamp()
+        with lock:
+            sheets[sheet_id].append(values)
+        counters['form_posts'] += 1
+        return Response('Your response has been recorded.', status=200)
+
+    @app.route('/_standin/stats')
+    def stats():
+        with lock:
+            rows = {sheet_id: len(sheet.rows) for sheet_id, sheet in sheets.items()}
+        return {'counters': counters, 'rows': rows}
+
+    return app
+
+
+def default_sheets(num_players, data_dir=None):
+    pools_columns = ['Timestamp'] + list(FORMS[settings.POOLS_FORM_ID][1].values())
+    results_columns = ['Timestamp'] + list(FORMS[settings.RESULTS_FORM_ID][1].values())
+    sheets = {
+        settings.USER_SHEET_ID: synthetic_registration(num_players),
+        settings.TOURNAMENT_SHEET_ID: Sheet(pools_columns),
+        settings.RESULTS_SHEET_ID: Sheet(results_columns),
+    }
+    if data_dir:
+        for sheet_id, name in [(settings.USER_SHEET_ID, 'registration.csv'),
+                               (settings.TOURNAMENT_SHEET_ID, 'pools.csv'),
+                               (settings.RESULTS_SHEET_ID, 'results.csv')]:
+            try:
+                sheets[sheet_id] = load_sheet(f'{data_dir}/{name}')
+            except FileNotFoundError:
+                pass
+    return sheets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8060)
+    parser.add_argument('--players', type=int, default=100, help='synthetic registrations to seed')
+    parser.add_argument('--data-dir', help='seed from registration.csv/pools.csv/results.csv in this directory')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='mean added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='uniform +/- jitter on the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--throttle-rps', type=float, help='answer 429 above this many requests per second')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    app = create_app(default_sheets(args.players, args.data_dir), args.latency_ms, args.jitter_ms,
+                     args.error_rate, args.throttle_rps, args.seed)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
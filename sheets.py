@@ -0,0 +1,164 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from io import StringIO
+
+import pandas as pd
+
+import metrics
+
+
+@dataclass(frozen=True)
+class SheetResponse:
+    """Raw result of one sheet download, as returned by a poller's fetch function"""
+    text: str = None
+    etag: str = None
+    last_modified: str = None
+    not_modified: bool = False  # server answered 304 to our validators
+
+
+@dataclass(frozen=True)
+class SheetSnapshot:
+    """Immutable, already-parsed view of one sheet as published by SheetPoller"""
+    url: str
+    version: int  # bumped only when the sheet content actually changes
+    fetched_at: float
+    data: object  # whatever the source's build function produced; treat as read-only
+    digest: str = None
+    etag: str = None
+    last_modified: str = None
+
+
+def content_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SheetPoller:
+    """Refreshes sheets in background threads and publishes parsed snapshots.
+
+    `sources` maps a CSV URL to `(interval_seconds, build)`, where `build(df)`
+    turns a freshly downloaded DataFrame into the structure callbacks read.
+    Each URL gets its own thread, so one slow export never delays the others,
+    and `get(url)` only touches the network-free snapshot table. Until a sheet
+    first loads, get() waits, but only up to `ready_timeout` after the poller
+    started; after that a sheet that still can't be fetched returns None at once.
+
+    `fetch(url, etag, last_modified)` returns a SheetResponse or None. Refreshes
+    send the previous validators and hash the body, so a 304 or byte-identical
+    export keeps the current snapshot (and its version) without re-parsing.
+    """
+
+    def __init__(self, fetch, sources, ready_timeout=15.0):
+        self.fetch = fetch
+        self.sources = dict(sources)
+        self.ready_timeout = ready_timeout
+        self._snapshots = {}  # url -> SheetSnapshot, replaced wholesale on change
+        self._checked_at = {}  # url -> time of the last successful fetch
+        self._ready = {url: threading.Event() for url in self.sources}
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._threads = []
+        self._ready_deadline = None  # monotonic time after which get() stops waiting for a first load
+        self._changed = threading.Condition()
+        self._counters_lock = threading.Lock()  # one poller thread per sheet bumps these
+        self._counters = {'changed': 0, 'unchanged': 0, 'not_modified': 0, 'errors': 0}
+
+    def start(self):
+        # Started lazily from get() so each gunicorn worker gets its own threads after fork
+        with self._start_lock:
+            if self._threads:
+                return
+            self._ready_deadline = time.monotonic() + self.ready_timeout
+            for url in self.sources:
+                thread = threading.Thread(target=self._run, args=(url,), daemon=True,
+                                          name=f"sheet-poller-{len(self._threads)}")
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def _count(self, outcome):
+        with self._counters_lock:
+            self._counters[outcome] += 1
+
+    def refresh(self, url):
+        """Fetch and rebuild one sheet now. Keeps the previous snapshot on failure."""
+        _, build = self.sources[url]
+        previous = self._snapshots.get(url)
+        if previous is None:
+            response = self.fetch(url, None, None)
+        else:
+            response = self.fetch(url, previous.etag, previous.last_modified)
+        if response is None:
+            self._count('errors')
+            return False
+        self._checked_at[url] = time.time()
+
+        if previous is not None:
+            if response.not_modified:
+                self._count('not_modified')
+                return True
+            digest = content_digest(response.text)
+            if digest == previous.digest:
+                self._count('unchanged')
+                return True
+        elif response.not_modified:
+            return False  # nothing to fall back on; shouldn't happen without validators
+        else:
+            digest = content_digest(response.text)
+
+        with metrics.timer('sheet_parse_seconds', source=getattr(build, '__name__', 'csv')):
+            df = pd.read_csv(StringIO(response.text))
+            data = build(df) if build else df
+        version = previous.version + 1 if previous else 1
+        self._snapshots[url] = SheetSnapshot(url, version, time.time(), data,
+                                             digest, response.etag, response.last_modified)
+        self._count('changed')
+        self._ready[url].set()
+        with self._changed:
+            self._changed.notify_all()
+        return True
+
+    def _run(self, url):
+        interval, _ = self.sources[url]
+        while not self._stop.is_set():
+            try:
+                self.refresh(url)
+            except Exception as e:
+                self._count('errors')
+                print(f"Error polling {url}: {e}")
+            self._stop.wait(interval)
+
+    def get(self, url):
+        snapshot = self._snapshots.get(url)
+        if snapshot is None:
+            self.start()
+            remaining = self._ready_deadline - time.monotonic()
+            if remaining > 0:
+                self._ready[url].wait(remaining)
+            snapshot = self._snapshots.get(url)
+        return snapshot
+
+    def version(self, url):
+        snapshot = self._snapshots.get(url)
+        return snapshot.version if snapshot else 0
+
+    def wait_for_change(self, url, known_version, timeout):
+        """Block until the snapshot of `url` moves past `known_version` or `timeout` passes.
+
+        Returns the current version either way.
+        """
+        self.start()
+        with self._changed:
+            self._changed.wait_for(lambda: self.version(url) != known_version, timeout)
+        return self.version(url)
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self._counters)
+        now = time.time()
+        counters['versions'] = {url: snap.version for url, snap in self._snapshots.items()}
+        counters['age'] = {url: now - checked for url, checked in self._checked_at.items()}
+        return counters
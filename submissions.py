@@ -0,0 +1,182 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import transport
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    form_url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS submissions_due ON submissions (status, next_attempt_at);
+"""
+
+
+class PermanentSubmitError(Exception):
+    """The form rejected a submission in a way retrying won't fix"""
+
+
+class SubmissionQueue:
+    """Durable queue of Google Form posts, drained by a background worker.
+
+    `enqueue` only writes a row to SQLite, so callbacks return immediately and
+    a submission survives a crash or restart. The worker posts due rows with at most `concurrency` requests in flight and at least
+    `min_interval` seconds between posts, retrying throttled or failed posts
+    with jittered exponential backoff. Several processes may share one file;
+    rows are claimed atomically so each is posted by one worker at a time.
+    """
+
+    def __init__(self, path, post=transport.post, concurrency=4, min_interval=0.15, max_attempts=20,
+                 base_backoff=1.0, max_backoff=60.0, claim_timeout=120.0):
+        self.path = path
+        self.post = post  # (url, data=...) -> response; the shared pooled transport by default
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout  # reclaim rows left 'sending' by a dead worker
+        self._rate_lock = threading.Lock()
+        self._next_slot = 0.0
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            yield conn
+        finally:
+            conn.close()
+
+    def start(self):
+        # Started lazily (not at import) so each gunicorn worker gets its own thread after fork
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='submission-queue')
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def enqueue(self, form_url, payload):
+        """Persist one form post and return its submission id"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO submissions (form_url, payload, status, next_attempt_at, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (form_url, json.dumps(payload), PENDING, now, now))
+            submission_id = cursor.lastrowid
+        self.start()
+        self._wakeup.set()
+        return submission_id
+
+    def status(self, submission_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT status, attempts, last_error FROM submissions WHERE id = ?',
+                               (submission_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM submissions GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+    def retry_failed(self):
+        """Put every permanently failed submission back in the queue"""
+        with self._connect() as conn:
+            conn.execute('UPDATE submissions SET status = ?, attempts = 0, next_attempt_at = ? WHERE status = ?',
+                         (PENDING, time.time(), FAILED))
+        self._wakeup.set()
+
+    def _claim_due(self, limit):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                'SELECT id, form_url, payload, attempts FROM submissions '
+                'WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND claimed_at < ?) '
+                'ORDER BY id LIMIT ?',
+                (PENDING, now, SENDING, now - self.claim_timeout, limit)).fetchall()
+            conn.executemany('UPDATE submissions SET status = ?, claimed_at = ? WHERE id = ?',
+                             [(SENDING, now, row['id']) for row in rows])
+            conn.execute('COMMIT')
+        return rows
+
+    def _throttle(self):
+        with self._rate_lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def _post(self, form_url, payload):
+        self._throttle()
+        r = self.post(form_url, data=payload)
+        if r.status_code in (200, 302):
+            return
+        if r.status_code == 429 or r.status_code >= 500:
+            raise RuntimeError(f"HTTP {r.status_code}")
+        raise PermanentSubmitError(f"HTTP {r.status_code}")
+
+    def _deliver(self, row):
+        attempts = row['attempts'] + 1
+        try:
+            self._post(row['form_url'], json.loads(row['payload']))
+        except Exception as e:
+            if isinstance(e, PermanentSubmitError) or attempts >= self.max_attempts:
+                status, next_attempt_at = FAILED, time.time()
+            else:
+                backoff = min(self.base_backoff * 2 ** (attempts - 1), self.max_backoff)
+                status, next_attempt_at = PENDING, time.time() + backoff * random.uniform(0.5, 1.5)
+            print(f"Error submitting results (attempt {attempts}): {e}")
+            with self._connect() as conn:
+                conn.execute('UPDATE submissions SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? '
+                             'WHERE id = ?', (status, attempts, next_attempt_at, str(e), row['id']))
+            return
+        with self._connect() as conn:
+            conn.execute('UPDATE submissions SET status = ?, attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?',
+                         (SENT, attempts, time.time(), row['id']))
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='submission-post') as pool:
+            while not self._stop.is_set():
+                self._wakeup.clear()
+                try:
+                    rows = self._claim_due(self.concurrency * 2)
+                except Exception as e:
+                    print(f"Error reading submission queue: {e}")
+                    rows = []
+                if not rows:
+                    self._wakeup.wait(1.0)
+                    continue
+                wait([pool.submit(self._deliver, row) for row in rows])
@@ -0,0 +1,97 @@
+"""The rating-window CP-SAT model against the exact one (rating_window=None)"""
+import random
+import time
+
+import pytest
+
+from tourney.matchmaking import (NoMatchingError, PairHistory, anneal_matchings, generate_matchings,
+                                 match_within_budget)
+from tourney.models import Player
+
+N = 16
+
+
+def make_players(seed, n = N):
+    rng = random.Random(seed)
+    return [Player(pid, f"Player {pid}", "", 1000, latest_elo=rng.randint(600, 1800)) for pid in range(1, n + 1)]
+
+
+def solve(players, counts, round_num, rating_window):
+    try:
+        return generate_matchings(players, counts, round_num, rating_window=rating_window, time_limit=20)
+    except NoMatchingError:
+        return None
+
+
+def objective(players, pools):
+    elo = {p.id: p.latest_elo for p in players}
+    return sum(elo[a] * elo[b] for game in pools for k, a in enumerate(game.get_pids()) for b in game.get_pids()[k+1:])
+
+
+def check_rules(players, counts, pools):
+    idx = {p.id: i for i, p in enumerate(players)}
+    assert sorted(pid for game in pools for pid in game.get_pids()) == sorted(idx)
+    for game in pools:
+        rows = [idx[pid] for pid in game.get_pids()]
+        for i in rows:
+            met = [counts[i, j] for j in rows if j != i]
+            assert max(met) < 2  # no third meeting
+            assert sum(1 for c in met if c > 0) <= 1  # at least 2 new partners
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_windowed_pools_follow_the_rules_and_never_beat_exact(seed):
+    players = make_players(seed)
+    history = PairHistory()
+    for round_num in range(1, 6):
+        counts = history.counts([p.id for p in players])
+        exact = solve(players, counts, round_num, None)
+        assert exact is not None
+        check_rules(players, counts, exact)
+        windowed = solve(players, counts, round_num, 6)
+        if windowed is not None:
+            check_rules(players, counts, windowed)
+            assert objective(players, windowed) <= objective(players, exact)
+        history.add_round(round_num, exact)
+
+
+def test_window_infeasibility_is_left_to_the_caller():
+    # by round 3 the 6-place window has no room left, while the exact model does
+    players = make_players(0)
+    history = PairHistory()
+    for round_num in (1, 2):
+        history.add_round(round_num, solve(players, history.counts([p.id for p in players]), round_num, None))
+    counts = history.counts([p.id for p in players])
+    with pytest.raises(NoMatchingError):
+        generate_matchings(players, counts, 3, rating_window=6, time_limit=20)
+    assert solve(players, counts, 3, None) is not None
+
+
+def test_match_within_budget_keeps_to_its_budget_at_200_players():
+    # the manager's ladder; by round 3 the window is infeasible and the exact rung is far too big to build
+    budget, slack = 5.0, 1.0
+    players = make_players(0, 200)
+    ids = [p.id for p in players]
+    history = PairHistory()
+    for round_num in range(1, 4):
+        recent, loosened = history.counts(ids, last_rounds=2), history.counts(ids, last_rounds=1)
+        started = time.monotonic()
+        pools = match_within_budget(players, [(recent, 6), (recent, None), (loosened, 6), ([], 6)], round_num,
+                                    time_budget=budget)
+        assert time.monotonic() - started <= budget + slack
+        assert len(pools) == 50
+        history.add_round(round_num, pools)
+
+
+def test_hybrid_keeps_the_history_rules_when_the_windowed_heuristic_fails():
+    # 200 players after 2 rounds: neither the heuristic nor CP-SAT fits a 6-place window any more
+    players = make_players(0, 200)
+    ids = [p.id for p in players]
+    history = PairHistory()
+    for round_num in (1, 2):
+        history.add_round(round_num, anneal_matchings(players, history.counts(ids), round_num))
+    recent = history.counts(ids)
+    with pytest.raises(NoMatchingError):
+        anneal_matchings(players, recent, 3, rating_window=6)
+    pools = match_within_budget(players, [(recent, 6)], 3, time_budget=10.0)
+    check_rules(players, recent, pools)
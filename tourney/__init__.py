@@ -0,0 +1,12 @@
+"""Tournament manager, importable outside the notebook.
+
+    from tourney import TourneyManager
+    t = TourneyManager()  # registrations download in the background
+    python -m tourney  # the same manager behind an admin prompt
+
+Importing the package is cheap: the solvers (ortools, cvxpy, scipy.optimize)
+and pandas are only imported by the functions that use them.
+"""
+from .manager import TourneyManager
+from .matchmaking import NoMatchingError, PairHistory
+from .models import Game, GameTable, Player
@@ -0,0 +1,134 @@
+"""Admin prompt for running the tournament without the notebook.
+
+    python -m tourney --engine hybrid --time-budget 30
+    GOOGLE_BASE_URL=http://127.0.0.1:8060 python -m tourney   # against sheet_standin.py
+    python -m tourney --restore   # pick up where a crashed session left off
+
+The prompt comes up before the registration form has finished downloading;
+the first command that needs the player list waits for it.
+"""
+import argparse
+import math
+
+import settings
+
+from .manager import TourneyManager
+
+HELP = """Commands:
+  search <email>     find player ids by (part of) their email
+  add <id> ...       check players in
+  unadd <id> ...     check players out
+  active             list checked-in players
+  players            pick up new registrations from the form
+  round              rate, match and publish the next round
+  publish            publish the current round again (after a failed publish or a restore)
+  ratings [n]        refresh ratings and show the top n (default 20)
+  stats              timings and counters so far
+  quit"""
+
+
+def show_ratings(t, limit):
+    rated = sorted((p for p in t.players if p.latest_elo is not None), key=lambda p: -p.latest_elo)
+    for p in rated[:limit]:
+        spread = f" +/- {math.sqrt(p.elo_variance):.0f}" if p.elo_variance is not None else ""
+        active = "*" if t.is_active[p.id] else " "
+        print(f"{active} {p.id:>4} {p.name:<30} {p.latest_elo:>5}{spread}")
+    if not rated:
+        print("No ratings yet")
+
+
+def show_stats(t):
+    for name, series in sorted(t.stats.snapshot().items()):
+        for labels, value in series:
+            label = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+            if isinstance(value, dict):
+                mean = f"{value['mean'] * 1000:.1f} ms" if value['mean'] is not None else "-"
+                value = f"n={value['count']} mean={mean} errors={value['errors']}"
+            print(f"{name}{{{label}}} {value}")
+
+
+def run_command(t, cmd):
+    """Run one command line; returns False when the admin is done"""
+    if not cmd:
+        return True
+    name, args = cmd[0], cmd[1:]
+    if name in ("quit", "exit", "done"):
+        return False
+    if name == "help":
+        print(HELP)
+    elif name == "search" and args:
+        matches = t.search_players(args[0])
+        for p in matches[:5]:
+            print(f"{p.id}: {p.email} ({p.name})")
+        if len(matches) > 5:
+            print(f"{len(matches) - 5} more matches, narrow the search")
+        if not matches:
+            print("No matches")
+    elif name in ("add", "unadd") and args:
+        for pid in args:
+            if int(pid) not in t.is_active:
+                print(f"No player {pid}")
+            elif name == "add":
+                t.make_active(int(pid))
+            else:
+                t.make_inactive(int(pid))
+    elif name == "active":
+        active = t.get_active_players()
+        for p in active:
+            print(f"{p.id}: {p.name}")
+        print(f"{len(active)} active" + ("" if len(active) % 4 == 0 else f" ({4 - len(active) % 4} short of full pools)"))
+    elif name == "players":
+        before = len(t.players)
+        t.refresh_players_list()
+        print(f"{len(t.players) - before} new registrations, {len(t.players)} total")
+    elif name == "round":
+        t.make_new_round()
+    elif name == "publish":
+        t.publish_current_round()
+    elif name == "ratings":
+        t.update_ratings()
+        show_ratings(t, int(args[0]) if args else 20)
+    elif name == "stats":
+        show_stats(t)
+    else:
+        print("Unknown command. Enter help for the list.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', choices=['cpsat', 'heuristic', 'hybrid'], default='hybrid')
+    parser.add_argument('--time-budget', type=float, default=30.0, help='seconds matchmaking may take per round')
+    parser.add_argument('--workers', type=int, default=8, help='parallel CP-SAT workers')
+    parser.add_argument('--full-refit-every', type=int, default=5, help='incremental rating updates between full refits')
+    parser.add_argument('--wait', action='store_true', help='load registrations before showing the prompt')
+    parser.add_argument('--checkpoint', default=settings.CHECKPOINT_PATH,
+                        help="state log written after every round and check-in ('' to turn off)")
+    parser.add_argument('--restore', action='store_true', help='rebuild the state from --checkpoint instead of the sheets')
+    args = parser.parse_args()
+
+    if args.restore:
+        t = TourneyManager.restore(args.checkpoint)
+    else:
+        t = TourneyManager(wait=args.wait, checkpoint_path=args.checkpoint or None)
+    t.match_engine = args.engine
+    t.match_time_budget = args.time_budget
+    t.solver_workers = args.workers
+    t.full_refit_every = args.full_refit_every
+    print("Ready. Enter help for commands.")
+
+    while True:
+        try:
+            line = input(f"round {t.current_round}> ")
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        try:
+            if not run_command(t, line.strip().lower().split()):
+                break
+        except Exception as e:  # keep the prompt alive through a failed round or a bad id
+            print(f"Error: {type(e).__name__}: {e}")
+
+
+if __name__ == '__main__':
+    main()
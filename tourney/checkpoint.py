@@ -0,0 +1,260 @@
+"""Append-only checkpoints of the manager's state, for getting back up after a crash.
+
+The log is a run of frames: magic, payload length and crc32, then an
+uncompressed .npz payload of int/float/str columns plus a small JSON header.
+Every batch of registrations, check-in change, rating update and round
+appends one frame holding only what changed, fsynced before the call
+returns. Restoring replays the frames, so it needs no sheet downloads and
+no refits; a frame torn by a crash mid-write is cut off the end.
+"""
+import io
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from itertools import islice
+
+import numpy as np
+
+import metrics
+
+from .models import Game, Player, df_to_game_table
+
+MAGIC = b'TKC1'
+FRAME = struct.Struct('<4sII')  # magic, payload length, crc32 of the payload
+NET_COLUMNS = ["Round", "Net_number", "id1", "id2", "id3", "id4", "Match1Result", "Match2Result", "Match3Result"]
+COMPACT_AFTER = 200  # restore rewrites logs longer than this many frames as one snapshot
+
+
+def encode(kind, meta, arrays):
+    buf = io.BytesIO()
+    np.savez(buf, _header=np.array(json.dumps(dict(meta, kind=kind))), **arrays)
+    return buf.getvalue()
+
+
+def decode(payload):
+    with np.load(io.BytesIO(payload)) as npz:
+        meta = json.loads(npz['_header'].item())
+        arrays = {name: npz[name] for name in npz.files if name != '_header'}
+    return meta.pop('kind'), meta, arrays
+
+
+def read_records(path):
+    """[(kind, meta, arrays)] in write order, and the byte length of the intact part of the log"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        print(f"No checkpoint at {path} yet; starting from an empty state")
+        return [], 0
+    records = []
+    pos = 0
+    while pos + FRAME.size <= len(data):
+        magic, length, crc = FRAME.unpack_from(data, pos)
+        payload = data[pos + FRAME.size:pos + FRAME.size + length]
+        if magic != MAGIC or len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(decode(payload))
+        pos += FRAME.size + length
+    if pos < len(data):
+        print(f"Checkpoint {path} has a torn record at byte {pos}; dropping the last {len(data) - pos} bytes")
+    return records, pos
+
+
+def pool_array(pools):
+    return np.array([game.get_pids() for game in pools], dtype=np.int32).reshape(-1, 4)
+
+
+class Checkpoint:
+    """Append-only log of one manager's state; see the module docstring for the format"""
+
+    def __init__(self, path, fresh=True):
+        self.path = path
+        if fresh and os.path.exists(path) and os.path.getsize(path) > 0:
+            # never write over another tournament's log, it may be the only copy
+            moved = f"{path}.{time.strftime('%Y%m%d-%H%M%S')}"
+            os.replace(path, moved)
+            print(f"Moved the previous checkpoint to {moved}")
+        self._lock = threading.RLock()
+        self._file = open(path, 'ab')
+        self.saved_players = 0  # players already in the log; they only ever get appended
+        self.feed_generation = None  # ResultsFeed.generation at the last save
+        self.saved_nets = 0  # committed nets of that generation already in the log
+
+    def append(self, kind, meta=None, **arrays):
+        payload = encode(kind, meta or {}, arrays)
+        with self._lock, metrics.timer('checkpoint_write_seconds', kind=kind):
+            try:
+                self._file.write(FRAME.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                print(f"Error writing checkpoint: {e}")
+                return
+        metrics.inc('checkpoint_bytes_total', FRAME.size + len(payload))
+
+    def save_players(self, t):
+        with self._lock:
+            new = t._players[self.saved_players:]
+            if not new:
+                return
+            self.append('players',
+                        id=np.array([p.id for p in new], dtype=np.int64),
+                        name=np.array([p.name for p in new], dtype=str),
+                        email=np.array([p.email for p in new], dtype=str),
+                        initial_elo=np.array([p.initial_elo for p in new], dtype=float),
+                        games_played=np.array([p.games_played for p in new], dtype=np.int64))
+            self.saved_players += len(new)
+
+    def save_checkin(self, t, pids):
+        with self._lock:
+            self.save_players(t)  # players added by hand are logged before their check-in
+            self.append('checkin', pid=np.array(pids, dtype=np.int64),
+                        active=np.array([t._is_active[pid] for pid in pids], dtype=bool))
+
+    def save_ratings(self, t):
+        """Results feed position, committed nets, the rating posterior and everyone's latest Elo"""
+        with self._lock:
+            self.save_players(t)
+            meta = {'feed': None, 'updates_since_refit': None}
+            arrays = {}
+            feed = t.results
+            if feed is not None:
+                reset = feed.generation != self.feed_generation
+                new = islice(feed.committed.items(), 0 if reset else self.saved_nets, None)
+                meta['feed'] = {'etag': feed.etag, 'columns': feed.columns, 'consumed': feed.consumed,
+                                'prefix_digest': feed.prefix_digest, 'reset': reset}
+                arrays['nets'] = np.array([key + values for key, values in new], dtype=np.int64).reshape(-1, 9)
+                arrays['conflicted'] = np.array(sorted(feed.conflicted), dtype=np.int64).reshape(-1, 2)
+                self.feed_generation, self.saved_nets = feed.generation, len(feed.committed)
+            state = t.rating_state
+            if state is not None:
+                precision = state.precision.tocsc()
+                meta['updates_since_refit'] = state.updates_since_refit
+                arrays['rating_ids'] = np.array(state.ids, dtype=np.int64)
+                arrays['rating_mean'] = state.mean
+                arrays['precision_data'] = precision.data
+                arrays['precision_indices'] = precision.indices
+                arrays['precision_indptr'] = precision.indptr
+            rated = [p for p in t._players if p.latest_elo is not None]
+            arrays['elo_ids'] = np.array([p.id for p in rated], dtype=np.int64)
+            arrays['elo'] = np.array([p.latest_elo for p in rated], dtype=float)
+            arrays['elo_variance'] = np.array([np.nan if p.elo_variance is None else p.elo_variance for p in rated],
+                                              dtype=float)
+            self.append('ratings', meta, **arrays)
+
+    def save_round(self, t):
+        self.append('round', {'round': t.current_round}, pools=pool_array(t.pool_history[-1]))
+
+    def compact(self, t):
+        """Rewrite the log as a single snapshot of `t`, atomically replacing the old one"""
+        with self._lock:
+            tmp = self.path + '.tmp'
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            snapshot = Checkpoint(tmp, fresh=False)
+            snapshot.save_players(t)
+            # numbered from the manager's counter, not pools[0], which an empty round doesn't have
+            first = t.current_round - len(t.pool_history) + 1
+            for round_num, pools in enumerate(t.pool_history, first):
+                snapshot.append('round', {'round': round_num}, pools=pool_array(pools))
+            active = [p.id for p in t._players if t._is_active[p.id]]
+            if active:
+                snapshot.save_checkin(t, active)
+            snapshot.save_ratings(t)
+            snapshot._file.close()
+            self._file.close()
+            os.replace(tmp, self.path)
+            self._file = open(self.path, 'ab')
+            self.saved_players = snapshot.saved_players
+            self.feed_generation, self.saved_nets = snapshot.feed_generation, snapshot.saved_nets
+
+
+def apply_record(t, pending, kind, meta, arrays):
+    if kind == 'players':
+        for pid, name, email, initial_elo, games_played in zip(
+                arrays['id'].tolist(), arrays['name'].tolist(), arrays['email'].tolist(),
+                arrays['initial_elo'].tolist(), arrays['games_played'].tolist()):
+            t.add_player(Player(pid, name, email, initial_elo, games_played=games_played))
+    elif kind == 'checkin':
+        for pid, active in zip(arrays['pid'].tolist(), arrays['active'].tolist()):
+            t._is_active[pid] = active
+    elif kind == 'round':
+        pools = [Game(meta['round'], *pids, -1) for pids in arrays['pools'].tolist()]
+        t.pool_history.append(pools)
+        t.pair_history.add_round(meta['round'], pools)
+        t.current_round = meta['round']
+    elif kind == 'ratings':
+        apply_ratings(t, pending, meta, arrays)
+    else:
+        print(f"Skipping unknown checkpoint record {kind!r}")
+
+
+def apply_ratings(t, pending, meta, arrays):
+    """Elos go straight onto the players; the feed and posterior stay arrays until finish_restore"""
+    if meta['feed'] is not None:
+        if meta['feed']['reset']:
+            pending['nets'] = []
+        pending['feed'] = meta['feed']
+        pending['nets'].append(arrays['nets'])
+        pending['conflicted'] = arrays['conflicted']
+    if meta['updates_since_refit'] is not None:
+        pending['rating'] = (meta['updates_since_refit'], arrays)
+    for pid, elo, variance in zip(arrays['elo_ids'].tolist(), arrays['elo'].tolist(), arrays['elo_variance'].tolist()):
+        player = t._id_to_player[pid]
+        player.latest_elo = int(elo)
+        player.elo_variance = None if np.isnan(variance) else variance
+
+
+def finish_restore(t, pending):
+    """Build the ResultsFeed and RatingState from a restore's arrays.
+
+    Deferred until the manager first needs them (see TourneyManager.results),
+    since they need pandas and scipy and restoring shouldn't wait on those imports.
+    """
+    if pending['feed'] is not None:
+        from .results import ResultsFeed
+        feed = ResultsFeed()
+        feed.etag, feed.columns = pending['feed']['etag'], pending['feed']['columns']
+        feed.consumed, feed.prefix_digest = pending['feed']['consumed'], pending['feed']['prefix_digest']
+        for row in pending['nets'].tolist():
+            feed.committed[tuple(row[:2])] = tuple(row[2:])
+        feed.conflicted = set(map(tuple, pending['conflicted'].tolist()))
+        feed.games = t.games
+        t._results = feed
+    if pending['rating'] is not None:
+        import scipy.sparse as sp
+        from .ratings import RatingState
+        updates_since_refit, arrays = pending['rating']
+        ids = arrays['rating_ids'].tolist()
+        precision = sp.csc_matrix((arrays['precision_data'], arrays['precision_indices'], arrays['precision_indptr']),
+                                  shape=(len(ids), len(ids)))
+        t._rating_state = RatingState(ids, arrays['rating_mean'], precision, updates_since_refit)
+
+
+def restore(t, path):
+    """Replay the log at `path` into the freshly made manager `t`; returns the Checkpoint to keep appending to"""
+    records, intact = read_records(path)
+    if os.path.exists(path) and intact < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(intact)
+    pending = {'feed': None, 'nets': [], 'conflicted': None, 'rating': None}
+    for kind, meta, arrays in records:
+        apply_record(t, pending, kind, meta, arrays)
+    pending['nets'] = np.concatenate(pending['nets']) if pending['nets'] else np.zeros((0, 9), dtype=np.int64)
+    if pending['feed'] is not None:
+        # games are the committed nets, three per net in commit order, exactly as the feed built them
+        t.games = df_to_game_table(dict(zip(NET_COLUMNS, pending['nets'].T)))
+    t._restored = pending
+
+    checkpoint = Checkpoint(path, fresh=False)
+    checkpoint.saved_players = len(t._players)
+    if pending['feed'] is not None:
+        checkpoint.feed_generation, checkpoint.saved_nets = 0, len(pending['nets'])  # a new ResultsFeed's generation
+    if len(records) > COMPACT_AFTER:
+        checkpoint.compact(t)
+    print(f"Restored round {t.current_round}: {len(t._players)} players "
+          f"({sum(t._is_active.values())} active), {len(t.games)} games from {len(records)} checkpoint records")
+    return checkpoint
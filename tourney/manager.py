@@ -0,0 +1,271 @@
+"""The tournament manager: check-in, rounds and ratings.
+
+Only numpy and the HTTP transport load with this module. pandas, scipy,
+ortools and cvxpy come in the first time a method needs them, and the
+registration form downloads on a background thread, so a fresh kernel (or
+`python -m tourney`) is ready to take commands right away.
+"""
+import threading
+from concurrent.futures import Future
+
+import metrics
+import settings
+
+from .checkpoint import Checkpoint, finish_restore, restore as restore_checkpoint
+from .matchmaking import PairHistory, match_within_budget
+from .models import GameTable, Player
+from .publishing import publish_round
+
+
+def in_background(fn):
+    """Run fn() on a daemon thread (quitting never waits on it); returns its Future"""
+    future = Future()
+    def run():
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class TourneyManager:
+    def __init__(self, load_players = True, wait = False, checkpoint_path = settings.CHECKPOINT_PATH):
+        # appended to after every round and check-in change; None turns checkpointing off
+        self.checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        self._restored = None # feed and posterior arrays from a restore, built into objects on first use
+        self._players = []
+        self._id_to_player = {}
+        self.pool_history = [] # one list per round, each list contains Game objects
+        self.pair_history = PairHistory() # pair counts over pool_history, updated per round
+        self._is_active = {} # player_id -> bool
+        self.current_round = 0
+        self._loading = None # Future of the background registration download
+        self.results = None # ResultsFeed, made on the first refresh; remembers which result rows were already ingested
+        self.games = GameTable.empty() # every reported game, columnar
+        self.rating_state = None # posterior from the last fit, for incremental updates
+        self.full_refit_every = 5 # rounds of incremental updates between full refits
+        self.match_time_budget = 30.0 # seconds make_new_round may spend on matchmaking
+        self.solver_workers = 8 # parallel CP-SAT workers
+        self.match_engine = "hybrid" # "cpsat", "heuristic" or "hybrid" (heuristic pools as CP-SAT hint)
+        self.stats = metrics.REGISTRY # timings and counters; stats.snapshot() to inspect, stats.render() for Prometheus
+        if load_players:
+            if wait:
+                self.load_players_from_form()
+            else:
+                self._loading = in_background(self.load_players_from_form)
+
+    # Reading these waits for the background registration download, if one is running
+    @property
+    def players(self):
+        self.wait_for_players()
+        return self._players
+
+    @property
+    def id_to_player(self):
+        self.wait_for_players()
+        return self._id_to_player
+
+    @property
+    def is_active(self):
+        self.wait_for_players()
+        return self._is_active
+
+    @classmethod
+    def restore(cls, checkpoint_path = settings.CHECKPOINT_PATH):
+        """Rebuild the manager from its checkpoint after a crash, without downloading anything or refitting.
+
+        Checkpoints keep going to the same file afterwards.
+        """
+        t = cls(load_players = False, checkpoint_path = None)
+        with metrics.timer('checkpoint_restore_seconds'):
+            t.checkpoint = restore_checkpoint(t, checkpoint_path)
+        return t
+
+    # A restored manager builds these from the checkpoint the first time they're read
+    @property
+    def results(self):
+        self._finish_restore()
+        return self._results
+
+    @results.setter
+    def results(self, feed):
+        self._results = feed
+
+    @property
+    def rating_state(self):
+        self._finish_restore()
+        return self._rating_state
+
+    @rating_state.setter
+    def rating_state(self, state):
+        self._rating_state = state
+
+    def _finish_restore(self):
+        pending, self._restored = self._restored, None
+        if pending is not None:
+            finish_restore(self, pending)
+
+    def wait_for_players(self):
+        """Block until the registration form has been loaded"""
+        loading = self._loading
+        if loading is None:
+            return
+        try:
+            loading.result()
+        except Exception as e:
+            print(f"Error loading players: {e}; call refresh_players_list() to retry")
+        self._loading = None
+
+    def refresh_game_history(self):
+        """Ingest result rows added since the last call; returns (new_games, reset)"""
+        if self.results is None:
+            from .results import ResultsFeed
+            self.results = ResultsFeed()
+        new_games, reset = self.results.poll()
+        self.games = self.results.games
+        return new_games, reset
+    
+    def refresh_players_list(self):
+        from .results import get_form_players
+        for player in get_form_players():
+            if player.id not in self.is_active:
+                self.add_player(player)
+        if self.checkpoint is not None:
+            self.checkpoint.save_players(self)
+    
+    def update_ratings(self, refresh_games = True, full_refit = False):
+        from .ratings import fit_rating_state, update_rating_state
+        new_games, reset = self.refresh_game_history() if refresh_games else (GameTable.empty(), False)
+        needs_refit = (full_refit or reset or self.rating_state is None
+                       or self.rating_state.updates_since_refit >= self.full_refit_every)
+        with metrics.timer('rating_fit_seconds', kind = "full" if needs_refit else "incremental"):
+            if needs_refit:
+                self.rating_state = fit_rating_state(self.players, self.games, 1000)
+            else:
+                self.rating_state = update_rating_state(self.rating_state, self.players, new_games)
+        if self.checkpoint is not None:
+            self.checkpoint.save_ratings(self)
+    
+    def load_players_from_form(self):
+        from .results import get_form_players
+        for player in get_form_players():
+            self.add_player(player)
+        if self.checkpoint is not None:
+            self.checkpoint.save_players(self)
+        
+    def make_new_round(self, manual_assigned_games = []):
+        pids = set([pid for game in manual_assigned_games for pid in game.get_pids()])
+        assert len(pids) == len(manual_assigned_games) * 4
+        for pid in pids:
+            assert pid in self.is_active
+
+        self.update_ratings()
+        active_players = [i for i in self.get_active_players() if i.id not in pids]
+        assert len(active_players) % 4 == 0
+
+        
+        active_ids = [p.id for p in active_players]
+        recent_games = self.pair_history.counts(active_ids, last_rounds = 2)
+        loosened = self.pair_history.counts(active_ids, last_rounds = 1)
+        self.current_round += 1
+
+        print("Trying to get new matchings avoiding repeats from the last 2 rounds")
+        # widen the rating window before giving up any history (None is the
+        # exact model, skipped when it's too big to build in time), and drop
+        # the no-repeat rule last
+        with metrics.timer('matchmaking_seconds', engine = self.match_engine):
+            new_pools = match_within_budget(active_players, [
+                (recent_games, 6),
+                (recent_games, None),
+                (loosened, 6),
+                ([], 6),
+            ], self.current_round, self.match_time_budget, self.solver_workers, self.match_engine)
+        
+        self.pool_history.append(new_pools)
+        self.pair_history.add_round(self.current_round, new_pools)
+        # checkpoint before publishing: after a crash or a failed publish, the
+        # manager knows the round and can re-publish it instead of re-matching
+        if self.checkpoint is not None:
+            self.checkpoint.save_round(self)
+        metrics.gauge('current_round', self.current_round)
+        metrics.gauge('active_players', len(active_players) + len(pids))
+
+        self.publish_current_round()
+
+    def publish_current_round(self):
+        """Publish the latest round's pools again, e.g. after a failed publish or a restore"""
+        if not self.pool_history:
+            print("No round to publish yet")
+            return
+        with metrics.timer('publish_round_seconds'):
+            publish_round(self.pool_history[-1], self.current_round)
+
+    def add_player(self, player: Player):
+        # the background loader calls this, so it must not wait on itself
+        self._players.append(player)
+        self._is_active[player.id] = False
+        self._id_to_player[player.id] = player
+    
+    def make_active(self, pid : int):
+        assert pid in self.is_active
+        if not self.is_active[pid]:
+            self.is_active[pid] = True
+            print(f"{pid}:{self.id_to_player[pid].name} is now active.")
+            if self.checkpoint is not None:
+                self.checkpoint.save_checkin(self, [pid])
+        else:
+            print(f"{pid} is already active.")
+    
+    def make_inactive(self, pid : int):
+        assert pid in self.is_active
+        if self.is_active[pid]:
+            self.is_active[pid] = False
+            print(f"{pid}: {self.id_to_player[pid].name} is now inactive.")
+            if self.checkpoint is not None:
+                self.checkpoint.save_checkin(self, [pid])
+        else:
+            print(f"{pid} is already inactive.")
+    
+    def get_active_players(self):
+        return [p for p in self.players if self.is_active[p.id]]
+    
+    def get_num_active_players(self):
+        return len(self.get_active_players())
+
+    def search_players(self, search_str):
+        return [p for p in self.players if search_str in p.email]
+
+    def activate_players_session(self):
+        print("Activating players session")
+        print("To search for an ID by email enter: search <email>")
+        print("To activate a player enter: add <id>")
+        print("To deactivate a player enter: unadd <id>")
+        print("When done activating players enter: done")
+        while True:
+            cmd = input("Enter command (or 'done' to finish): ").strip().lower().split()
+            if cmd == []:
+                continue
+            if cmd[0] == "search":
+                matching_emails = [f"{p.id}: {p.email}" for p in self.search_players(cmd[1])]
+                print("Matching emails:")
+                for me in matching_emails[:min(5, len(matching_emails))]:
+                    print(me)
+                if len(matching_emails) > 5:
+                    print(f"too many matches")
+            elif cmd[0] == "add":
+                player_id = int(cmd[1])
+                self.make_active(player_id)
+            elif cmd[0] == "unadd":
+                player_id = int(cmd[1])
+                self.make_inactive(player_id)
+            elif cmd[0] == "done":
+                break
+            else:
+                print("Unknown command. Please try again.")
+    
+    def test_add_examples(self):
+        i = 94
+        while i <= 105:
+            self.make_active(i)
+            i += 1
@@ -0,0 +1,346 @@
+"""Pools of four: the CP-SAT model, the annealing heuristic and the relaxation ladder"""
+import random
+import time
+
+import numpy as np
+
+import metrics
+
+from .models import Game, as_game_table
+
+
+class NoMatchingError(Exception):
+    """CP-SAT proved the constraints infeasible or ran out of time without any solution"""
+
+
+PAIR_SLOTS = ([0, 0, 0, 1, 1, 2], [1, 2, 3, 2, 3, 3])  # the 6 pairs within a pool of 4
+# Building the CP-SAT model in Python costs about 20-25us per transitivity
+# clause (measured from 40 players exact to 200 players with a 24 window) and
+# happens before the solver's own time limit starts, so it's budgeted up front.
+BUILD_SECONDS_PER_CLAUSE = 25e-6
+
+
+class PairHistory:
+    """How many times each pair of players has shared a pool, keyed by player id.
+
+    Updated once per round with that round's pools only, so it never rescans
+    the history. Each round's pools are kept as an index array too, which
+    makes a window over the last few rounds cost only those rounds' games.
+    """
+    def __init__(self):
+        self.index = {} # player id -> row/column
+        self.totals = np.zeros((0, 0), dtype=np.int16)
+        self.rounds = [] # (round_num, pools x 4 array of rows), oldest first
+
+    def _rows(self, pids):
+        for pid in pids:
+            if pid not in self.index:
+                self.index[pid] = len(self.index)
+        grow = len(self.index) - len(self.totals)
+        if grow > 0:
+            self.totals = np.pad(self.totals, ((0, grow), (0, grow)))
+        return np.array([self.index[pid] for pid in pids], dtype=np.int64)
+
+    def add_round(self, round_num, games):
+        rows = self._rows(as_game_table(games).pids().ravel().tolist()).reshape(-1, 4)
+        self.rounds.append((round_num, rows))
+        self._accumulate(self.totals, rows)
+
+    @staticmethod
+    def _accumulate(matrix, rows):
+        a, b = rows[:, PAIR_SLOTS[0]].ravel(), rows[:, PAIR_SLOTS[1]].ravel()
+        np.add.at(matrix, (a, b), 1)
+        np.add.at(matrix, (b, a), 1)
+
+    def counts(self, pids, last_rounds = None):
+        """len(pids) x len(pids) pair counts, over all rounds or only the last `last_rounds`"""
+        if last_rounds is None:
+            matrix = self.totals
+        else:
+            matrix = np.zeros_like(self.totals)
+            start = max(len(self.rounds) - last_rounds, 0)
+            for _, rows in self.rounds[start:]:
+                self._accumulate(matrix, rows)
+        idx = np.array([self.index.get(pid, -1) for pid in pids], dtype=np.int64)
+        known = np.flatnonzero(idx >= 0)  # players who haven't played yet have no row
+        out = np.zeros((len(pids), len(pids)), dtype=matrix.dtype)
+        out[np.ix_(known, known)] = matrix[np.ix_(idx[known], idx[known])]
+        return out
+
+
+def pair_count_matrix(players, game_history):
+    """Pair counts aligned with `players`, from Games (list or GameTable) or an already built matrix"""
+    if isinstance(game_history, np.ndarray):
+        assert game_history.shape == (len(players), len(players))
+        return game_history
+    history = PairHistory()
+    history.add_round(None, game_history)
+    return history.counts([player.id for player in players])
+
+
+def generate_matchings(players, game_history, round_num, rating_window = 6, time_limit = None, num_workers = 8, hint = None):
+    """Pools from the CP-SAT model. `time_limit` covers building the model as well as solving it:
+    a model whose projected build alone would take more than half of it is never built."""
+    from ortools.sat.python import cp_model  # imported on the first solve, not when the manager starts
+    started = time.monotonic()
+    print(players)
+    id_to_idx = {player.id: i for i, player in enumerate(players)}
+    n = len(players)
+    assert n % 4 == 0
+
+    pairings = pair_count_matrix(players, game_history)
+    assert pairings.max(initial=0) <= 2
+
+    # Pairs that already met twice can never share a pool again (no third
+    # meeting), so they never get a variable. `rating_window` is a heuristic on
+    # top of that: pairs more than that many places apart in the rating order
+    # are left out too. That keeps the model small, but it can miss the optimum
+    # and can be infeasible when the exact model isn't; it then raises
+    # NoMatchingError like any other failure and the caller's ladder moves on.
+    # rating_window=None (or >= n - 1) is the exact model.
+    rank = np.empty(n, dtype=np.int64)
+    rank[sorted(range(n), key=lambda i: players[i].latest_elo)] = np.arange(n)
+    if rating_window is None:
+        rating_window = n - 1
+    allow = (np.abs(rank[:, None] - rank[None, :]) <= rating_window) & (pairings < 2)
+    np.fill_diagonal(allow, False)
+    def allowed(i, j):
+        return allow[i, j]
+
+    degree = allow.sum(axis=1)
+    clauses = int((degree * (degree - 1) // 2).sum())
+    if time_limit is not None and clauses * BUILD_SECONDS_PER_CLAUSE > time_limit / 2:
+        metrics.inc('cpsat_models_skipped_total')
+        raise NoMatchingError(f"model too big for {time_limit:.1f}s ({clauses} clauses, "
+                              f"~{clauses * BUILD_SECONDS_PER_CLAUSE:.1f}s to build)")
+
+    model = cp_model.CpModel()
+    # Pools are encoded by who shares a pool, not by pool labels, so there are
+    # no interchangeable pool numbers for the solver to search over.
+    matched = {(i,j): model.NewBoolVar(f"matched_{i}_{j}") for i in range(n) for j in range(i+1, n) if allowed(i, j)}
+    def pair(i, j):
+        return matched.get((i,j) if i < j else (j,i))
+
+    neighbours = [[j for j in range(n) if j != i and pair(i, j) is not None] for i in range(n)]
+    for i in range(n):
+        # Exactly 3 pool-mates each ...
+        model.Add(sum(pair(i, j) for j in neighbours[i]) == 3)
+        # ... at least 2 of them new partners (so at most 1 old one)
+        olds = [pair(i, j) for j in neighbours[i] if pairings[i, j] > 0]
+        if len(olds) >= 2:
+            model.Add(sum(olds) <= 1)
+    # ... and sharing a pool is transitive, so pools are cliques of exactly 4
+    for i in range(n):
+        for a, j in enumerate(neighbours[i]):
+            for k in neighbours[i][a+1:]:
+                if j < k:
+                    jk = pair(j, k)
+                    if jk is None:
+                        model.AddBoolOr([pair(i, j).Not(), pair(i, k).Not()])
+                    else:
+                        model.AddBoolOr([pair(i, j).Not(), pair(i, k).Not(), jk])
+
+    model.Maximize(sum(players[i].latest_elo * players[j].latest_elo * b for (i,j), b in matched.items()))
+    if hint is not None:
+        # Start the search from known pools (e.g. from anneal_matchings)
+        pool_of = {pid: k for k, game in enumerate(hint) for pid in game.get_pids()}
+        for (i,j), b in matched.items():
+            k = pool_of.get(players[i].id)
+            model.AddHint(b, k is not None and k == pool_of.get(players[j].id))
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = num_workers
+    if time_limit is not None:
+        # When time runs out the best feasible pools so far are used
+        solver.parameters.max_time_in_seconds = max(time_limit - (time.monotonic() - started), 0.0)
+    with metrics.timer('cpsat_solve_seconds', players=n):
+        status = solver.Solve(model)
+    metrics.inc('cpsat_solves_total', status=solver.StatusName(status))
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        print('No solution found.')
+        raise NoMatchingError(solver.StatusName(status))
+    
+    games = []
+    game_objs = []
+    seen = set()
+    for index in range(n):
+        if index in seen:
+            continue
+        pool = [index] + [j for j in neighbours[index] if solver.Value(pair(index, j))]
+        seen.update(pool)
+        print(f'{[players[i] for i in pool]} = {len(games)}')
+        games.append([players[i] for i in pool])
+    for pool in games:
+        sorted_pool = sorted(pool, key=lambda p: p.id)
+        game_objs.append(Game(round = round_num, p1=sorted_pool[0].id, p2=sorted_pool[1].id, p3=sorted_pool[2].id, p4=sorted_pool[3].id, result=-1))
+    return game_objs
+
+
+def rating_order_pools(players, round_num):
+    """Pools of 4 straight down the rating order; always valid, ignores pair history"""
+    ordered = sorted(players, key=lambda p: p.latest_elo, reverse=True)
+    game_objs = []
+    for k in range(0, len(ordered), 4):
+        pool = sorted(ordered[k:k+4], key=lambda p: p.id)
+        game_objs.append(Game(round = round_num, p1=pool[0].id, p2=pool[1].id, p3=pool[2].id, p4=pool[3].id, result=-1))
+    return game_objs
+
+
+def anneal_matchings(players, game_history, round_num, rating_window = None, iterations = None, seed = 0, restarts = 3,
+                     deadline = None):
+    """Heuristic matchmaker with the same rules and objective as generate_matchings.
+
+    Seeds pools straight down the rating order (the unconstrained optimum), then
+    simulated annealing swaps players between pools, mostly between nearby
+    pools, with rule violations (a third meeting, fewer than 2 new partners)
+    as a heavy penalty. Pairs further than `rating_window` apart in the rating
+    order count as violations too, so the result is a valid hint for the
+    CP-SAT model with the same window. Keeps the best valid state seen and
+    restarts up to `restarts` times if a run never reaches one. Stops early
+    at `deadline` (a time.monotonic() value) with the best valid state so far;
+    raises NoMatchingError if no run cleared every violation.
+    """
+    id_to_idx = {player.id: i for i, player in enumerate(players)}
+    n = len(players)
+    assert n % 4 == 0
+    num_groups = n // 4
+    counts = pair_count_matrix(players, game_history).astype(np.int32)  # copy, it's modified below
+    elos = [float(player.latest_elo) for player in players]
+    order = sorted(range(n), key=lambda i: elos[i], reverse=True)
+    if rating_window is not None:
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+        out_of_window = np.abs(rank[:, None] - rank[None, :]) > rating_window
+        counts[out_of_window] = np.maximum(counts[out_of_window], 2)  # same as a third meeting
+    counts = counts.tolist()  # plain lists index much faster in the inner loop
+    penalty = 10 * max(max(elos) ** 2, 1.0)
+
+    def pool_score(pool):
+        value = 0.0
+        violations = 0
+        olds = [0, 0, 0, 0]
+        for a in range(4):
+            i = pool[a]
+            row = counts[i]
+            for b in range(a + 1, 4):
+                j = pool[b]
+                value += elos[i] * elos[j]
+                if row[j]:
+                    olds[a] += 1
+                    olds[b] += 1
+                    if row[j] >= 2:
+                        violations += 1
+        return value, violations + sum(1 for o in olds if o > 1)
+
+    rng = random.Random(seed)
+    iterations = iterations or 300 * n
+    spread = max(elos) - min(elos) + 1.0
+    t_start, t_end = spread * max(elos), 1.0
+    best_value, best_pools = None, None
+    for attempt in range(restarts):
+        pools = [order[k:k+4] for k in range(0, n, 4)]
+        scores = [pool_score(pool) for pool in pools]
+        value = sum(v for v, _ in scores)
+        violations = sum(v for _, v in scores)
+        if violations == 0:
+            best_value, best_pools = value, [pool[:] for pool in pools]
+        for it in range(iterations):
+            if num_groups < 2:
+                break
+            if deadline is not None and it % 256 == 0 and time.monotonic() > deadline:
+                break
+            g = rng.randrange(num_groups)
+            h = g + rng.choice((-2, -1, 1, 2)) if rng.random() < 0.9 else rng.randrange(num_groups)
+            if h == g or not 0 <= h < num_groups:
+                continue
+            a, b = rng.randrange(4), rng.randrange(4)
+            new_g, new_h = pools[g][:], pools[h][:]
+            new_g[a], new_h[b] = new_h[b], new_g[a]
+            score_g, score_h = pool_score(new_g), pool_score(new_h)
+            d_value = score_g[0] + score_h[0] - scores[g][0] - scores[h][0]
+            d_violations = score_g[1] + score_h[1] - scores[g][1] - scores[h][1]
+            delta = d_value - penalty * d_violations
+            temperature = t_start * (t_end / t_start) ** (it / iterations)
+            if delta >= 0 or rng.random() < np.exp(delta / temperature):
+                pools[g], pools[h] = new_g, new_h
+                scores[g], scores[h] = score_g, score_h
+                value += d_value
+                violations += d_violations
+                # keep the best valid state seen, the walk can wander off it late in the run
+                if violations == 0 and (best_value is None or value > best_value):
+                    best_value, best_pools = value, [pool[:] for pool in pools]
+        if best_pools is not None or (deadline is not None and time.monotonic() > deadline):
+            break
+    if best_pools is None:
+        raise NoMatchingError(f"heuristic left {violations} rule violations after {restarts} restarts")
+    pools = best_pools
+
+    game_objs = []
+    for pool in pools:
+        sorted_pool = sorted((players[i] for i in pool), key=lambda p: p.id)
+        game_objs.append(Game(round = round_num, p1=sorted_pool[0].id, p2=sorted_pool[1].id, p3=sorted_pool[2].id, p4=sorted_pool[3].id, result=-1))
+    return game_objs
+
+
+def match_within_budget(players, history_ladder, round_num, time_budget = 30.0, num_workers = 8, engine = "hybrid"):
+    """Run the matchmaker down a constraint-relaxation ladder within `time_budget` seconds.
+
+    `history_ladder` is a list of (game_history, rating_window) rungs from
+    strictest to loosest, where game_history is a list of Games or a pair-count
+    matrix aligned with `players`. Each rung gets an equal share of the time left, so a
+    quickly proven infeasible rung hands its time to the next ones, and a rung
+    whose model would take longer than its share to build is skipped without
+    building it. If no rung yields pools, the rating-order fallback guarantees a
+    round anyway.
+
+    `engine` is "cpsat" (exact model only), "heuristic" (anneal_matchings only)
+    or "hybrid": the heuristic's pools seed CP-SAT as a hint and are used as
+    is if CP-SAT can't improve on them in time.
+    """
+    deadline = time.monotonic() + time_budget
+    for k, (history, rating_window) in enumerate(history_ladder):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            hint = None
+            window = rating_window  # for CP-SAT
+            if engine in ("heuristic", "hybrid"):
+                try:
+                    with metrics.timer('anneal_seconds', players=len(players)):
+                        hint = anneal_matchings(players, history, round_num, rating_window, deadline = deadline)
+                except NoMatchingError as e:
+                    if rating_window is not None:
+                        # The window is only a heuristic: pools outside it that keep
+                        # this rung's history rules beat moving down the ladder. Only
+                        # the exact model can improve on them (if it fits in time).
+                        print(f"Heuristic failed within window {rating_window} ({e}); retrying without it")
+                        metrics.inc('anneal_window_fallbacks_total')
+                        try:
+                            with metrics.timer('anneal_seconds', players=len(players)):
+                                hint = anneal_matchings(players, history, round_num, None, deadline = deadline)
+                            window = None
+                        except NoMatchingError:
+                            pass
+                    if hint is None and engine == "heuristic":
+                        raise e
+                if engine == "heuristic":
+                    return hint
+            remaining = deadline - time.monotonic()  # annealing spends the budget too
+            if remaining <= 0:
+                if hint is not None:
+                    return hint
+                break
+            try:
+                return generate_matchings(players, history, round_num, rating_window = window,
+                                          time_limit = remaining / (len(history_ladder) - k), num_workers = num_workers,
+                                          hint = hint)
+            except NoMatchingError:
+                if hint is None:
+                    raise
+                return hint
+        except NoMatchingError as e:
+            metrics.inc('match_rung_failures_total', rung=k)
+            print(f"Rung {k} (window {rating_window}) failed: {e}; loosening constraints")
+    metrics.inc('match_rating_order_fallbacks_total')
+    print("Falling back to pools in rating order")
+    return rating_order_pools(players, round_num)
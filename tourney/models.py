@@ -0,0 +1,115 @@
+"""Players and games, plus the columnar GameTable every solver reads"""
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class Player:
+    id: int
+    name: str
+    email: str
+    initial_elo: float
+    latest_elo: float = None
+    games_played: int = 0
+    elo_variance: float = None # posterior variance of latest_elo; large means few informative games
+
+
+@dataclass(slots=True)
+class Game:
+    # Player IDs
+    round : int
+    p1: int
+    p2: int
+    p3: int
+    p4: int
+    result: int  # 1 if p1/p2 win, 0 if p3/p4 win
+
+    def get_pids(self):
+        return [self.p1, self.p2, self.p3, self.p4]
+
+
+GAME_COLUMNS = ["round", "p1", "p2", "p3", "p4", "result"]
+
+
+@dataclass(eq=False)
+class GameTable:
+    """Columnar game store: one int32 array per Game field, row k is game k"""
+    round: np.ndarray
+    p1: np.ndarray
+    p2: np.ndarray
+    p3: np.ndarray
+    p4: np.ndarray
+    result: np.ndarray
+
+    @classmethod
+    def empty(cls):
+        return cls(*(np.zeros(0, dtype=np.int32) for _ in GAME_COLUMNS))
+
+    @classmethod
+    def from_games(cls, games):
+        data = np.array([[g.round, g.p1, g.p2, g.p3, g.p4, g.result] for g in games], dtype=np.int32).reshape(-1, 6)
+        return cls(*np.ascontiguousarray(data.T))
+
+    @classmethod
+    def concat(cls, tables):
+        tables = list(tables)
+        if not tables:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(t, c) for t in tables]) for c in GAME_COLUMNS))
+
+    def __len__(self):
+        return len(self.round)
+
+    def pids(self):
+        """games x 4 array of player ids, p1/p2 against p3/p4"""
+        return np.stack([self.p1, self.p2, self.p3, self.p4], axis=1)
+
+    def select(self, mask):
+        return GameTable(*(getattr(self, c)[mask] for c in GAME_COLUMNS))
+
+    def keys(self):
+        return list(zip(*(getattr(self, c).tolist() for c in GAME_COLUMNS)))
+
+    def to_games(self):
+        return [Game(*key) for key in self.keys()]
+
+    def __repr__(self):
+        return f"GameTable({len(self)} games)"
+
+
+def as_game_table(games):
+    return games if isinstance(games, GameTable) else GameTable.from_games(games)
+
+
+def index_lookup(id_to_idx):
+    """Dense array mapping player id -> index (-1 if unknown), for vectorized id translation"""
+    ids = np.fromiter(id_to_idx.keys(), dtype=np.int64, count=len(id_to_idx))
+    lookup = np.full(ids.max(initial=-1) + 1, -1, dtype=np.int64)
+    lookup[ids] = np.fromiter(id_to_idx.values(), dtype=np.int64, count=len(id_to_idx))
+    return lookup
+
+
+# Each reported net is three games: id1 partners id2, then id3, then id4
+NET_GAMES = [("id2", "id3", "id4", "Match1Result"),
+             ("id3", "id2", "id4", "Match2Result"),
+             ("id4", "id2", "id3", "Match3Result")]
+
+
+def df_to_game_table(df):
+    """GameTable straight from results rows, three games per row in report order.
+
+    `df` can be a DataFrame or any mapping of column name -> array.
+    """
+    col = {c: np.asarray(df[c], dtype=np.int32) for c in ["Round", "id1", "id2", "id3", "id4",
+                                                          "Match1Result", "Match2Result", "Match3Result"]}
+    def interleave(names):
+        return np.stack([col[name] for name in names], axis=1).ravel()
+    return GameTable(
+        round = np.repeat(col["Round"], 3),
+        p1 = np.repeat(col["id1"], 3),
+        p2 = interleave([g[0] for g in NET_GAMES]),
+        p3 = interleave([g[1] for g in NET_GAMES]),
+        p4 = interleave([g[2] for g in NET_GAMES]),
+        result = interleave([g[3] for g in NET_GAMES]),
+    )
@@ -0,0 +1,77 @@
+"""Posting a round's pools to the pools Form"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+import transport
+
+
+def post_pool_row(round_num, net_num, ids):
+    """Post one row of the pools sheet; returns True if the Form accepted it"""
+    new_row_data = {
+        'entry.1134473475': round_num,
+        'entry.1834803213': net_num,
+        'entry.1013925837': ids[0],
+        'entry.2138865174': ids[1],
+        'entry.463748120': ids[2],
+        'entry.1477352260': ids[3],
+    }
+    r = transport.post(settings.POOLS_FORM_URL, data=new_row_data)
+    if r.status_code != 200 and r.status_code != 302:
+        print("Failed:", r.status_code)
+        return False
+    return True
+
+
+def post_pools(game, net_num):
+    try:
+        ok = post_pool_row(game.round, net_num, game.get_pids())
+        print("Submitted:", game)
+        time.sleep(0.15) 
+        return ok
+        
+    except Exception as e:
+        print(f"Error submitting results: {e}")
+        return False
+
+
+def publish_round(pools, round_num, max_workers=8, min_interval=0.05, attempts=3):
+    """Post a whole round concurrently, then flip its "published" marker.
+
+    Pools go out over at most `max_workers` connections, spaced at least
+    `min_interval` seconds apart, and failed posts are retried. Only when every
+    net is in does the marker row (net 0, id1 = number of nets) get posted; the
+    app hides a round until its marker shows up, so players never see a
+    half-published round.
+    """
+    lock = threading.Lock()
+    next_slot = [0.0]
+
+    def post(net_num):
+        with lock:
+            now = time.monotonic()
+            delay = next_slot[0] - now
+            next_slot[0] = max(now, next_slot[0]) + min_interval
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            return post_pool_row(round_num, net_num, pools[net_num - 1].get_pids())
+        except Exception as e:
+            print(f"Error posting net {net_num}: {e}")
+            return False
+
+    remaining = list(range(1, len(pools) + 1))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in range(attempts):
+            results = list(executor.map(post, remaining))
+            remaining = [net for net, ok in zip(remaining, results) if not ok]
+            if not remaining:
+                break
+    if remaining:
+        raise RuntimeError(f"Round {round_num} not published, nets {remaining} failed to post")
+
+    if not post_pool_row(round_num, 0, [len(pools), 0, 0, 0]):
+        raise RuntimeError(f"Round {round_num} pools posted but the published marker failed")
+    print(f"Published round {round_num}: {len(pools)} nets in {time.perf_counter() - start:.2f}s")
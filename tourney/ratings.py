@@ -0,0 +1,153 @@
+"""Elo fitting: full MAP refits and incremental Laplace updates between rounds"""
+from dataclasses import dataclass
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.special import expit
+
+from .models import as_game_table, index_lookup
+
+
+def games_to_design(games, id_to_idx):
+    """Sparse games x players matrix of team memberships (+0.5 for p1/p2, -0.5 for p3/p4) and the result vector"""
+    table = as_game_table(games)
+    m, n = len(table), len(id_to_idx)
+    cols = index_lookup(id_to_idx)[table.pids().ravel()]
+    assert (cols >= 0).all(), "game with an unregistered player"
+    rows = np.repeat(np.arange(m), 4)
+    vals = np.tile([0.5, 0.5, -0.5, -0.5], m)
+    A = sp.csr_matrix((vals, (rows, cols)), shape=(m, n))
+    results = table.result.astype(float)  # 1 if p1/p2 win, 0 if p3/p4 win
+    return A, results
+
+
+def optimize_ratings(players, games, default_mean = 1000, method = "lbfgs", x0 = None):
+    id_to_idx = {player.id: i for i, player in enumerate(players)}
+    
+    beta = np.log(10) / 400
+    n = len(players)
+    initial_ratings = np.array([player.initial_elo for player in players], dtype=float) # modify this according to input skill levels
+    sigma = 400.0
+    A, results = games_to_design(games, id_to_idx)
+    A = beta * A  # z = A @ ratings is the log-odds that p1/p2 win
+
+    if method == "cvxpy":
+        import cvxpy as cp  # ~1s to import and only this path uses it
+        ratings = cp.Variable(n)
+        # prior is rating is normal dist with stdev 400, mean self reported
+        self_report_prior = -0.5 * cp.sum_squares((ratings - initial_ratings) / sigma)
+        mean_prior = 10 * -0.5 * cp.sum_squares((cp.sum(ratings) / n - default_mean) / (sigma / np.sqrt(n)))
+        z = A @ ratings
+        log_likelihood = results @ z - cp.sum(cp.logistic(z))
+        objective = cp.Maximize(log_likelihood + self_report_prior) #+ mean_prior)
+        constraints = [ratings >= 0, ratings <= 2000]
+        problem = cp.Problem(objective, constraints)
+        problem.solve()
+        value = ratings.value
+    else:
+        from scipy.optimize import minimize  # slow to import; deferred until the first fit
+        # Same MAP objective, minimized directly with analytic gradients
+        def neg_log_posterior(r):
+            z = A @ r
+            nll = np.sum(np.logaddexp(0, z)) - results @ z
+            prior = 0.5 * np.sum(((r - initial_ratings) / sigma) ** 2)
+            grad = A.T @ (expit(z) - results) + (r - initial_ratings) / sigma ** 2
+            return nll + prior, grad
+        # Warm start (e.g. from last round's ratings) when given; the optimum barely moves between rounds
+        x0 = np.clip(initial_ratings if x0 is None else np.asarray(x0, dtype=float), 0, 2000)
+        value = minimize(neg_log_posterior, x0, jac=True, method="L-BFGS-B", bounds=[(0, 2000)] * n).x
+    #print(value)
+    if True:
+        for i in range(n):
+            players[i].latest_elo = round(value[i])
+    return value
+
+
+BETA = np.log(10) / 400
+SIGMA = 400.0
+
+
+@dataclass
+class RatingState:
+    """Posterior after the last rating update: mode plus curvature (Laplace approximation)"""
+    ids: list  # player id for each row/column below
+    mean: np.ndarray
+    precision: sp.csc_matrix  # Hessian of the negative log posterior at `mean`; sparse, players only couple through shared games
+    updates_since_refit: int = 0
+
+
+def rating_precision(A, ratings, sigma = SIGMA):
+    """Hessian of the negative log posterior at `ratings`; A is the beta-scaled design matrix"""
+    p = expit(A @ ratings)
+    W = p * (1 - p)
+    return (A.T @ sp.diags(W) @ A + sp.identity(A.shape[1]) / sigma ** 2).tocsc()
+
+
+def posterior_variance(precision, exact_below = 500):
+    """Per-player rating variance from the posterior precision (Laplace approximation).
+
+    Up to `exact_below` players this is the exact diagonal of the inverse.
+    Above that it falls back to 1 / diag(precision), which ignores correlations
+    between players (so it slightly understates the variance) but costs O(n).
+    """
+    if precision.shape[0] <= exact_below:
+        return np.diag(np.linalg.inv(precision.toarray()))
+    return 1.0 / precision.diagonal()
+
+
+def set_player_ratings(players, ids, ratings, precision):
+    id_to_idx = {pid: i for i, pid in enumerate(ids)}
+    variance = posterior_variance(precision)
+    for player in players:
+        i = id_to_idx[player.id]
+        player.latest_elo = round(ratings[i])
+        player.elo_variance = float(variance[i])
+
+
+def fit_rating_state(players, games, default_mean = 1000):
+    """Full MAP refit over the whole history, warm-started from each player's latest_elo"""
+    x0 = [p.latest_elo if p.latest_elo is not None else p.initial_elo for p in players]
+    ratings = optimize_ratings(players, games, default_mean, x0 = x0)
+    A, _ = games_to_design(games, {p.id: i for i, p in enumerate(players)})
+    state = RatingState([p.id for p in players], ratings, rating_precision(BETA * A, ratings))
+    set_player_ratings(players, state.ids, state.mean, state.precision)
+    return state
+
+
+def update_rating_state(state, players, new_games, newton_steps = 5):
+    """Online Laplace update: fold only `new_games` into the previous posterior.
+
+    The previous posterior N(mean, precision^-1) stands in for all earlier games,
+    so the cost depends on the number of players and new games, not on history.
+    Players registered since the last fit join with their self-reported prior.
+    """
+    import scipy.sparse.linalg as spla
+    ids = list(state.ids)
+    mean = state.mean.copy()
+    precision = state.precision
+    known = set(ids)
+    added = [p for p in players if p.id not in known]
+    if added:
+        ids += [p.id for p in added]
+        mean = np.concatenate([mean, [p.initial_elo for p in added]])
+        precision = sp.block_diag([precision, sp.identity(len(added)) / SIGMA ** 2], format = "csc")
+    id_to_idx = {pid: i for i, pid in enumerate(ids)}
+
+    A, results = games_to_design(new_games, id_to_idx)
+    A = BETA * A
+    prior_mean = mean
+    r = mean.copy()
+    for _ in range(newton_steps):
+        p = expit(A @ r)
+        grad = A.T @ (p - results) + precision @ (r - prior_mean)
+        hess = (A.T @ sp.diags(p * (1 - p)) @ A + precision).tocsc()
+        # hess is sparse, symmetric positive definite and well conditioned by the
+        # prior, so CG converges in a few dozen products where a sparse LU fills in
+        step, _ = spla.cg(hess, grad, rtol = 1e-10)
+        r = np.clip(r - step, 0, 2000)
+        if np.abs(step).max() < 1e-3:
+            break
+    new_precision = rating_precision(A, r, sigma = np.inf) + precision
+
+    set_player_ratings(players, ids, r, new_precision)
+    return RatingState(ids, r, new_precision, state.updates_since_refit + 1)
@@ -0,0 +1,187 @@
+"""Reading the registration and results sheets into players and games"""
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import settings
+import transport
+from sheets import content_digest
+
+from .models import GameTable, Player, df_to_game_table
+
+
+def get_form_responses():
+    url = settings.FORM_RESPONSES_CSV_URL
+    r = transport.get(url)
+    r.raise_for_status()
+    df = pd.read_csv(StringIO(r.text))
+    return df
+
+
+def get_form_players():
+    """One Player per registration; the id is the row number in the sheet"""
+    resps = get_form_responses()
+    assert len(resps["UCLA email"].unique()) == len(resps)
+    c_email  = "UCLA email"
+    c_name = "First and Last name"
+    c_skill = "What is your skill level"
+    players = []
+    for index, row in resps.iterrows():
+        skill = int(row[c_skill][0])
+        initial_elo = 600 + skill * 100
+        players.append(Player(index+2, row[c_name], row[c_email], initial_elo))
+    return players
+
+
+def remove_duplicates(df, validated = None):
+    """Collapse the duplicate reports of each net (all four players may report) in one pass.
+
+    Returns (clean, conflicts). clean has the first report of every net whose
+    reports all agree; conflicts is indexed by (Round, Net_number) with the
+    number of reports and the columns they disagree on, and those nets are
+    left out of clean until the sheet is fixed. Nets in `validated` (a set of
+    (Round, Net_number) keys) were checked before and are not checked again.
+    """
+    key_cols = ["Round", "Net_number"]
+    agree_cols = ["id1", "id2", "id3", "id4", "Match1Result", "Match2Result", "Match3Result"]
+
+    firsts = df.drop_duplicates(subset = key_cols, keep = "first")
+    keys = pd.MultiIndex.from_frame(df[key_cols])
+    unchecked = df[~keys.isin(list(validated))] if validated else df
+    grouped = unchecked.groupby(key_cols)
+    disagree = grouped[agree_cols].nunique(dropna = False) > 1
+    bad = disagree[disagree.any(axis = 1)]
+    conflicts = pd.DataFrame({
+        "reports": grouped.size().reindex(bad.index),
+        "columns": [[col for col in agree_cols if row[col]] for row in bad.to_dict("records")],
+    }, index = bad.index)
+
+    clean = firsts[~pd.MultiIndex.from_frame(firsts[key_cols]).isin(bad.index)]
+    return clean, conflicts
+
+
+def get_games():
+    url = settings.RESULTS_CSV_URL
+    r = transport.get(url)
+    r.raise_for_status()
+    df = pd.read_csv(StringIO(r.text))
+
+    return df
+
+
+def df_to_games(df):
+    return df_to_game_table(df).to_games()
+
+
+def get_game_history(validated = None):
+    """Games from every net whose reports agree; pass a set as `validated` to skip re-checking nets across calls"""
+    df = get_games()
+    df, conflicts = remove_duplicates(df, validated)
+    for (round_num, net), row in conflicts.iterrows():
+        print(f"Conflict in round {round_num} net {net}: {row['reports']} reports disagree on {', '.join(row['columns'])}")
+    if df.empty:
+        print("No reported Games")
+        return GameTable.empty()
+    if validated is not None:
+        validated.update(zip(df["Round"].tolist(), df["Net_number"].tolist()))
+    games = df_to_game_table(df)
+    return games
+
+
+class ResultsFeed:
+    """Append-only reader of the results sheet.
+
+    Remembers how much of the export it has already processed, so each poll
+    parses only the rows added since, checks them against the nets already
+    committed and returns just the new games. If earlier rows were edited or
+    deleted (e.g. to fix a conflict) it re-reads everything and says so.
+    """
+    key_cols = ["Round", "Net_number"]
+    agree_cols = ["id1", "id2", "id3", "id4", "Match1Result", "Match2Result", "Match3Result"]
+
+    def __init__(self, url = settings.RESULTS_CSV_URL):
+        self.url = url
+        self.etag = None
+        self.columns = None
+        self.consumed = 0 # characters of the export already processed
+        self.prefix_digest = None
+        self.committed = {} # (round, net) -> agreed values of agree_cols
+        self.conflicted = set() # nets whose reports disagree; fixed by editing the sheet
+        self.games = GameTable.empty() # all committed games
+        self.generation = 0 # bumped by every reset, so checkpoints know to rewrite the committed nets
+
+    def reset(self):
+        self.generation += 1
+        self.columns = None
+        self.consumed = 0
+        self.prefix_digest = None
+        self.committed = {}
+        self.conflicted = set()
+        self.games = GameTable.empty()
+
+    def poll(self):
+        """Fetch the sheet and ingest new rows; returns (new_games, reset)"""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        r = transport.get(self.url, headers = headers)
+        if r.status_code == 304:
+            metrics.inc('results_polls_total', outcome='not_modified')
+            return GameTable.empty(), False
+        r.raise_for_status()
+        with metrics.timer('results_ingest_seconds'):
+            return self._ingest_text(r.text, r.headers.get("ETag"))
+
+    def _ingest_text(self, text, etag):
+        self.etag = etag
+
+        # Appended rows leave everything we've consumed byte-for-byte unchanged,
+        # and the consumed part still ends on a line break
+        on_boundary = (text[self.consumed - 1:self.consumed] in ("\r", "\n")
+                       or text[self.consumed:self.consumed + 1] in ("", "\r", "\n"))
+        appended = (self.columns is not None and len(text) >= self.consumed and on_boundary
+                    and content_digest(text[:self.consumed]) == self.prefix_digest)
+        if appended:
+            tail = text[self.consumed:]
+            rows = pd.read_csv(StringIO(tail), header = None, names = self.columns) if tail.strip() else None
+        else:
+            if self.columns is not None:
+                print("Results sheet was edited; re-reading all results")
+            self.reset()
+            rows = pd.read_csv(StringIO(text))
+            self.columns = list(rows.columns)
+        self.consumed = len(text)
+        self.prefix_digest = content_digest(text)
+
+        new_games = self.ingest(rows) if rows is not None and not rows.empty else GameTable.empty()
+        metrics.inc('results_polls_total', outcome='appended' if appended else 'reset')
+        metrics.inc('results_games_total', len(new_games))
+        metrics.gauge('results_conflicted_nets', len(self.conflicted))
+        return new_games, not appended
+
+    def ingest(self, rows):
+        """Dedup new rows against the committed nets and commit the ones that agree"""
+        keys = list(zip(rows["Round"].tolist(), rows["Net_number"].tolist()))
+        rows = rows[np.array([key not in self.conflicted for key in keys], dtype = bool)]
+        keys = list(zip(rows["Round"].tolist(), rows["Net_number"].tolist()))
+        rows = rows[self.key_cols + self.agree_cols]
+        # Late reports of committed nets are checked against the report already used
+        seen = [key for key in dict.fromkeys(keys) if key in self.committed]
+        if seen:
+            earlier = pd.DataFrame([key + self.committed[key] for key in seen], columns = rows.columns)
+            rows = pd.concat([earlier, rows], ignore_index = True)
+        clean, conflicts = remove_duplicates(rows)
+        for (round_num, net), row in conflicts.iterrows():
+            if (round_num, net) in self.committed:
+                print(f"Late report for round {round_num} net {net} disagrees on {', '.join(row['columns'])}; keeping the first")
+            else:
+                print(f"Conflict in round {round_num} net {net}: {row['reports']} reports disagree on {', '.join(row['columns'])}")
+                self.conflicted.add((round_num, net))
+
+        clean_keys = list(zip(clean["Round"].tolist(), clean["Net_number"].tolist()))
+        fresh = clean[np.array([key not in self.committed for key in clean_keys], dtype = bool)]
+        for values in fresh.itertuples(index = False):
+            self.committed[tuple(values[:2])] = tuple(values[2:])
+        new_games = df_to_game_table(fresh)
+        self.games = GameTable.concat([self.games, new_games])
+        return new_games
@@ -0,0 +1,114 @@
+"""Shared keep-alive HTTP session for the Dash app and the tournament manager.
+
+Every call to Google goes through one pooled session with per-endpoint
+timeouts, and each request's latency is recorded in a per-endpoint histogram.
+"""
+import bisect
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds, by endpoint
+TIMEOUTS = {
+    'sheet_export': (3.05, float(os.environ.get('SHEET_EXPORT_TIMEOUT', '10'))),
+    'form_response': (3.05, float(os.environ.get('FORM_RESPONSE_TIMEOUT', '10'))),
+    'other': (3.05, 10),
+}
+
+# Upper bounds (seconds) of the latency histogram buckets; the last is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+def endpoint_for(url):
+    """Classify a URL into one of the TIMEOUTS endpoints"""
+    if '/formResponse' in url:
+        return 'form_response'
+    if '/export' in url:
+        return 'sheet_export'
+    return 'other'
+
+
+class LatencyHistogram:
+    """Cumulative-friendly latency histogram with fixed buckets"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def snapshot(self):
+        return {
+            'buckets': dict(zip(self.buckets, self.counts)),
+            'sum': self.total,
+            'count': self.count,
+            'errors': self.errors,
+        }
+
+
+class Transport:
+    def __init__(self, timeouts=None, pool_maxsize=32):
+        self.timeouts = dict(TIMEOUTS, **(timeouts or {}))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Sheet exports compress well; requests decodes gzip transparently
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def request(self, method, url, endpoint=None, **kwargs):
+        endpoint = endpoint or endpoint_for(url)
+        kwargs.setdefault('timeout', self.timeouts.get(endpoint, self.timeouts['other']))
+        start = time.perf_counter()
+        error = True
+        try:
+            response = self.session.request(method, url, **kwargs)
+            error = response.status_code >= 400
+            return response
+        finally:
+            self._observe(endpoint, time.perf_counter() - start, error)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _observe(self, endpoint, seconds, error):
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            histogram.observe(seconds, error)
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: h.snapshot() for endpoint, h in self._histograms.items()}
+
+
+_default = Transport()
+
+
+def get(url, **kwargs):
+    return _default.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return _default.post(url, **kwargs)
+
+
+def stats():
+    return _default.stats()